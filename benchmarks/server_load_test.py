@@ -0,0 +1,56 @@
+"""
+Measures requests per second of the DistributionServer against evaluating the same expressions in process.
+
+Start a server first, e.g.
+    python -m probability_calculator.server --path /tmp/probability_calculator.sock
+and then run
+    python benchmarks/server_load_test.py --path /tmp/probability_calculator.sock
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from probability_calculator.numeric_random_variables import FairDie
+from probability_calculator.server import Client
+
+
+def expressions(count: int, distinct: int, seed: int = 0):
+    generator = random.Random(seed)
+    specs = [(generator.randint(2, 12), generator.randint(2, 10)) for _ in range(distinct)]
+    return [specs[generator.randrange(distinct)] for _ in range(count)]
+
+
+def in_process(requests) -> float:
+    start = time.time()
+    for (n, k) in requests:
+        var = FairDie(n) * k
+        var.cdf(3.5 * k)
+    return len(requests) / (time.time() - start)
+
+
+def server(requests, clients: int, path, host: str, port: int) -> float:
+    def run(chunk):
+        with Client(path, host, port) as client:
+            for (n, k) in chunk:
+                client.query({"mul": [{"die": n}, k]}, [["cdf", 3.5 * k]])
+
+    chunks = [requests[i::clients] for i in range(clients)]
+    start = time.time()
+    with ThreadPoolExecutor(clients) as executor:
+        list(executor.map(run, chunks))
+    return len(requests) / (time.time() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--path", help="unix socket path of the server, otherwise --host and --port are used")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--distinct", type=int, default=50, help="number of distinct expressions")
+    parser.add_argument("--clients", type=int, default=8)
+    arguments = parser.parse_args()
+
+    requests = expressions(arguments.requests, arguments.distinct)
+    print("in process: %.1f requests/s" % in_process(requests))
+    print("server:     %.1f requests/s" % server(requests, arguments.clients, arguments.path, arguments.host, arguments.port))
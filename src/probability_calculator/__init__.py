@@ -1,3 +1,7 @@
 from .random_variables import RandomVariable, FairDie
 from .part import Outcome
-from .numeric_random_variables import NumericRandomVariable
\ No newline at end of file
+from .numeric_random_variables import NumericRandomVariable
+from .batch import RandomVariableBatch
+from .running_sum import RunningSum
+from .sum_tree import SumTree
+from .anytime import Refinement, anytime
@@ -0,0 +1,116 @@
+import contextvars
+import threading
+from concurrent.futures import Future
+from typing import Callable, List, Union
+
+# scale of goalPartCount in the current context, set by the passes of Refinement
+_goalPartCountScale = contextvars.ContextVar("goalPartCountScale", default=None)
+
+
+def _goalPartCount(goalPartCount: int) -> int:
+    """
+    returns the goalPartCount to use for simplification in the current context
+    """
+    scale = _goalPartCountScale.get()
+    if scale is None:
+        return goalPartCount
+    return max(2, int(goalPartCount * scale))
+
+
+class Refinement:
+    # scales of goalPartCount of the successive passes, the last pass is the regular computation
+    scales = [1 / 32, 1 / 8, 1 / 2, 1]
+
+    def __init__(self, compute: Callable, scales: Union[List[float], None] = None):
+        """
+        Runs compute (a function without arguments returning a random variable, e.g. lambda: X * 1000)
+        in a background thread, first with an aggressive simplification to a small fraction of goalPartCount
+        and then with successively larger ones.
+        The cdf bounds are valid for every number of parts, so every intermediate result can be used,
+        later results only have tighter bounds.
+        """
+        self._compute = compute
+        self._scales = scales if scales is not None else self.scales
+        self._results = []
+        self._condition = threading.Condition()
+        self._cancelled = False
+        self._done = False
+        # resolved with the result of the last pass
+        self.future = Future()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            for scale in self._scales:
+                if self._cancelled:
+                    break
+                context = contextvars.copy_context()
+                context.run(_goalPartCountScale.set, scale)
+                var = context.run(self._compute)
+                with self._condition:
+                    self._results.append(var)
+                    self._condition.notify_all()
+        except Exception as e:
+            self.future.set_exception(e)
+        else:
+            if len(self._results) > 0:
+                self.future.set_result(self._results[-1])
+            else:
+                self.future.cancel()
+        finally:
+            with self._condition:
+                self._done = True
+                self._condition.notify_all()
+
+    def latest(self, timeout: Union[float, None] = None):
+        """
+        returns the finest result available, waiting at most timeout seconds for the first one
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: len(self._results) > 0 or self._done, timeout)
+            if len(self._results) > 0:
+                return self._results[-1]
+            if not self._done:
+                raise TimeoutError("no result is available within the deadline")
+            if self.future.cancelled():
+                raise Exception("the refinement was cancelled before the first result")
+            raise self.future.exception()
+
+    def __iter__(self):
+        """
+        yields the successively finer results as soon as they are available
+        """
+        i = 0
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: len(self._results) > i or self._done)
+                if len(self._results) <= i:
+                    break
+                var = self._results[i]
+            yield var
+            i += 1
+
+    def cancel(self):
+        """
+        stops the refinement after the current pass
+        """
+        self._cancelled = True
+
+    def done(self) -> bool:
+        return self._done
+
+
+def anytime(compute: Callable, deadline: float = 0.2, refine: bool = True, scales: Union[List[float], None] = None):
+    """
+    Returns the finest result of compute which is available after deadline seconds together with the Refinement,
+    which keeps computing finer results in the background unless refine is False.
+    If the coarsest pass takes longer than the deadline, it is waited for.
+    """
+    refinement = Refinement(compute, scales)
+    with refinement._condition:
+        refinement._condition.wait_for(refinement.done, deadline)
+    var = refinement.latest()
+    if not refine:
+        refinement.cancel()
+    return (var, refinement)
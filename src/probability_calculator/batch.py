@@ -0,0 +1,239 @@
+from typing import List, Union
+import numpy as np
+from . import numeric_part
+from .numeric_random_variables import NumericRandomVariable
+
+
+class RandomVariableBatch:
+    # upper bound on the number of pairwise parts computed at once in __add__
+    maxChunkSize = 4_000_000
+
+    def __init__(
+            self, logp: np.ndarray, mean: np.ndarray, square: np.ndarray, min: np.ndarray, max: np.ndarray,
+            cdfError: Union[np.ndarray, None] = None):
+        """
+        A batch of B independent numeric random variables stored as padded part columns of shape (B, n).
+        Padding parts have logp = -inf, i.e. probability 0.
+        cdfError holds the additional error on the cdf bounds of each variable (see NumericRandomVariable).
+        Use RandomVariableBatch.from_variables to create a batch.
+        """
+        self._logp = logp
+        self._mean = mean
+        self._square = square
+        self._min = min
+        self._max = max
+        self._cdfError = cdfError if cdfError is not None else np.zeros(logp.shape[0])
+
+    @staticmethod
+    def from_variables(variables: List[NumericRandomVariable]) -> "RandomVariableBatch":
+        width = max(len(var._parts) for var in variables)
+        columns = [np.zeros((len(variables), width)) for _ in range(5)]
+        columns[0][:] = -np.inf
+        for (i, var) in enumerate(variables):
+            for (j, part) in enumerate(var._parts):
+                columns[0][i, j] = part._logp
+                columns[1][i, j] = part._mean
+                columns[2][i, j] = part._square
+                columns[3][i, j] = part._min
+                columns[4][i, j] = part._max
+
+        return RandomVariableBatch(*columns, np.array([var._cdfError for var in variables], dtype=float))
+
+    def to_variables(self) -> List[NumericRandomVariable]:
+        variables = []
+        for i in range(len(self)):
+            valid = self._logp[i] > -np.inf
+            parts = [
+                numeric_part._Part._clamped(*args) for args in zip(
+                    self._logp[i, valid].tolist(),
+                    self._mean[i, valid].tolist(),
+                    self._square[i, valid].tolist(),
+                    self._min[i, valid].tolist(),
+                    self._max[i, valid].tolist())
+            ]
+            var = NumericRandomVariable._fromParts(parts)
+            var._cdfError = float(self._cdfError[i])
+            variables.append(var)
+        return variables
+
+    def __len__(self) -> int:
+        return self._logp.shape[0]
+
+    def _columns(self):
+        return (self._logp, self._mean, self._square, self._min, self._max)
+
+    def __add__(self, other):
+        if isinstance(other, NumericRandomVariable):
+            other = RandomVariableBatch.from_variables([other])
+        if not isinstance(other, RandomVariableBatch):
+            return NotImplemented
+        if len(self) != len(other) and len(self) != 1 and len(other) != 1:
+            raise Exception("batches need to have the same size")
+
+        size = max(len(self), len(other))
+        pairs = self._logp.shape[1] * other._logp.shape[1]
+        chunk = max(1, self.maxChunkSize // max(pairs, 1))
+        results = []
+        for start in range(0, size, chunk):
+            rows = slice(start, start + chunk)
+            columns1 = [c if len(self) == 1 else c[rows] for c in self._columns()]
+            columns2 = [c if len(other) == 1 else c[rows] for c in other._columns()]
+            results.append(RandomVariableBatch._simplify(RandomVariableBatch._addColumns(columns1, columns2)))
+
+        ret = RandomVariableBatch._concat(results)
+        ret._cdfError = np.minimum(self._cdfError + other._cdfError, 1.)
+        return ret
+
+    def __radd__(self, other):
+        return self + other
+
+    def simplify(self, goalPartCount: Union[int, None] = None) -> "RandomVariableBatch":
+        """
+        merges parts of all variables in the batch at once until at most roughly goalPartCount parts are left
+        """
+        return RandomVariableBatch(*RandomVariableBatch._simplify(self._columns(), goalPartCount), self._cdfError)
+
+    def cdf(self, value) -> tuple[np.ndarray, np.ndarray]:
+        """
+        returns lower and upper bounds on the cumulative distribution functions of all variables,
+        value is either a scalar or an array with one value per variable
+        """
+        value = np.reshape(np.asarray(value, dtype=float), (-1, 1))
+        (lower, upper) = numeric_part._partialCdfArrays(np.exp(self._logp), *self._columns()[1:], value)
+        return (
+            np.maximum(np.sum(lower, axis=1) - self._cdfError, 0.),
+            np.minimum(np.sum(upper, axis=1) + self._cdfError, 1.))
+
+    def quantil(self, q) -> tuple[np.ndarray, np.ndarray]:
+        """
+        returns lower and upper bounds on the q quantil of all variables,
+        q is either a scalar or an array with one value per variable
+        """
+        q = np.reshape(np.asarray(q, dtype=float), (-1, 1))
+        p = np.exp(self._logp)
+        valid = self._logp > -np.inf
+        last = np.sum(valid, axis=1) - 1
+
+        def first_reaching(key, q):
+            # index of the first part (ordered by key) up to which the probability reaches q
+            order = np.argsort(np.where(valid, key, np.inf), axis=1, kind="stable")
+            cumulative = np.cumsum(np.take_along_axis(p, order, axis=1), axis=1)
+            index = np.minimum(np.argmax(cumulative >= q, axis=1), last)
+            index = np.where(np.any(cumulative >= q, axis=1), index, last)
+            return np.take_along_axis(np.take_along_axis(key, order, axis=1), index[:, None], axis=1)[:, 0]
+
+        # below the min of that part the cdf is smaller than q, at the max it is at least q
+        error = self._cdfError[:, None]
+        return (first_reaching(self._min, q - error), first_reaching(self._max, q + error))
+
+    @staticmethod
+    def _addColumns(columns1, columns2):
+        (logp1, mean1, square1, min1, max1) = [c[:, :, None] for c in columns1]
+        (logp2, mean2, square2, min2, max2) = [c[:, None, :] for c in columns2]
+        logp = logp1 + logp2
+        mean = mean1 + mean2
+        square = square1 + square2 + 2 * mean1 * mean2
+        min_value = min1 + min2
+        max_value = max1 + max2
+
+        # make sure that the rounding does not make problems with the numbers
+        mean = np.clip(mean, min_value, max_value)
+        square = np.maximum(square, mean**2)
+        square = np.minimum(square, mean**2 + (max_value - mean) * (mean - min_value))
+
+        size = logp.shape[0]
+        return [c.reshape(size, -1) for c in (logp, mean, square, min_value, max_value)]
+
+    @staticmethod
+    def _sortParts(columns, key):
+        """
+        sorts the parts of each variable by key, moves the padding to the end and removes unneeded padding
+        """
+        valid = columns[0] > -np.inf
+        order = np.argsort(np.where(valid, key, np.inf), axis=1, kind="stable")
+        width = max(int(np.max(np.sum(valid, axis=1), initial=0)), 1)
+        order = order[:, :width]
+        columns = [np.take_along_axis(c, order, axis=1) for c in columns]
+        valid = columns[0] > -np.inf
+        for c in columns[1:]:
+            c[~valid] = 0.
+        return columns
+
+    @staticmethod
+    def _simplify(columns, goalPartCount: Union[int, None] = None):
+        if goalPartCount is None:
+            goalPartCount = NumericRandomVariable.goalPartCount
+
+        columns = RandomVariableBatch._sortParts(columns, columns[1])
+        active = np.sum(columns[0] > -np.inf, axis=1) > goalPartCount
+        while np.any(active):
+            (logp, mean, square, min_value, max_value) = columns
+            left = [c[:, :-1] for c in columns]
+            right = [c[:, 1:] for c in columns]
+            merged = numeric_part._mergeArrays(left, right)
+
+            # same heuristic as NumericRandomVariable._simplifyParts, but for all adjacent pairs at once
+            with np.errstate(invalid="ignore", over="ignore"):
+                heuristic = numeric_part._cdfUncertaintyArrays(*merged[1:], exact_upper=False)
+                heuristic = heuristic - np.exp(left[0] - merged[0]) * numeric_part._cdfUncertaintyArrays(*left[1:])
+                heuristic = heuristic - np.exp(right[0] - merged[0]) * numeric_part._cdfUncertaintyArrays(*right[1:])
+                heuristic = np.nan_to_num(np.exp(merged[0]) * heuristic, nan=np.inf)
+            valid_pair = (left[0] > -np.inf) & (right[0] > -np.inf)
+            heuristic = np.where(valid_pair, heuristic, -np.inf)
+
+            # as in the scalar version, merge everything up to the goalPartCount largest value
+            if heuristic.shape[1] >= goalPartCount:
+                bound = np.sort(heuristic, axis=1)[:, -goalPartCount]
+            else:
+                bound = np.full(heuristic.shape[0], -np.inf)
+            merge = valid_pair & (heuristic <= bound[:, None]) & active[:, None]
+            # the heuristic of a pair is only valid for the unmerged parts, as the scalar version re-scores
+            # against the merged part, merge only every second pair of a run in one pass and iterate
+            position = np.arange(merge.shape[1])
+            run_start = np.maximum.accumulate(np.where(merge, -1, position), axis=1) + 1
+            merge = merge & ((position - run_start) % 2 == 0)
+
+            # merge runs of adjacent parts by aggregating segments
+            (size, width) = logp.shape
+            segment = np.cumsum(np.concatenate((np.ones((size, 1), dtype=bool), ~merge), axis=1), axis=1) - 1
+            index = (segment + width * np.arange(size)[:, None]).ravel()
+            new_logp = np.full(size * width, -np.inf)
+            np.logaddexp.at(new_logp, index, logp.ravel())
+            with np.errstate(invalid="ignore"):
+                factor = np.nan_to_num(np.exp(logp.ravel() - new_logp[index]))
+            new_mean = np.zeros(size * width)
+            np.add.at(new_mean, index, factor * mean.ravel())
+            new_square = np.zeros(size * width)
+            np.add.at(new_square, index, factor * square.ravel())
+            new_min = np.full(size * width, np.inf)
+            np.minimum.at(new_min, index, min_value.ravel())
+            new_max = np.full(size * width, -np.inf)
+            np.maximum.at(new_max, index, max_value.ravel())
+
+            valid = new_logp > -np.inf
+            new_min[~valid] = 0.
+            new_max[~valid] = 0.
+            new_mean = np.clip(new_mean, new_min, new_max)
+            new_square = np.maximum(new_square, new_mean**2)
+            new_square = np.minimum(new_square, new_mean**2 + (new_max - new_mean) * (new_mean - new_min))
+            columns = [c.reshape(size, width) for c in (new_logp, new_mean, new_square, new_min, new_max)]
+            columns = RandomVariableBatch._sortParts(columns, columns[1])
+
+            active = active & (np.sum(columns[0] > -np.inf, axis=1) > 1.1 * goalPartCount)
+
+        return RandomVariableBatch._sortParts(columns, columns[3])
+
+    @staticmethod
+    def _concat(columns_list) -> "RandomVariableBatch":
+        width = max(columns[0].shape[1] for columns in columns_list)
+        concatenated = []
+        for i in range(5):
+            padded = [
+                np.pad(
+                    columns[i],
+                    ((0, 0), (0, width - columns[i].shape[1])),
+                    constant_values=-np.inf if i == 0 else 0.)
+                for columns in columns_list
+            ]
+            concatenated.append(np.concatenate(padded, axis=0))
+        return RandomVariableBatch(*concatenated)
@@ -0,0 +1,39 @@
+import numpy as np
+
+
+def _quantileAverages(dist, levels, order: int):
+    """
+    returns the averages of the quantile function and its square over the levels of each bucket
+    with Gauss-Legendre quadrature of the given order
+    """
+    (nodes, weights) = np.polynomial.legendre.leggauss(order)
+    u = levels[:-1, None] + np.diff(levels)[:, None] * (nodes + 1) / 2
+    x = dist.ppf(u)
+    return (x @ weights / 2, x**2 @ weights / 2)
+
+
+def _continuousBuckets(dist, count: int, tail_mass: float, tolerance: float = 1e-9):
+    """
+    Splits the distribution between the quantiles tail_mass / 2 and 1 - tail_mass / 2
+    into count buckets of equal probability.
+    Returns the quantile levels, the bucket edges and the conditional first and second moments,
+    which are computed as averages of the quantile function over the levels of the bucket
+    with Gauss-Legendre quadrature.
+    The quantile function is steep in the outer buckets of heavy tails, there the two orders of the quadrature
+    disagree and the moments are computed with adaptive quadrature of the density instead.
+    """
+    levels = np.linspace(tail_mass / 2, 1 - tail_mass / 2, count + 1)
+    edges = dist.ppf(levels)
+    if not np.all(np.isfinite(edges)):
+        raise Exception("unbounded distributions need a positive tail_mass")
+
+    (means, squares) = _quantileAverages(dist, levels, 16)
+    (coarseMeans, coarseSquares) = _quantileAverages(dist, levels, 8)
+    scale = np.maximum(np.abs(edges[:-1]), np.abs(edges[1:]))
+    inaccurate = (np.abs(means - coarseMeans) > tolerance * scale) | (
+        np.abs(squares - coarseSquares) > tolerance * scale**2
+    )
+    for i in np.flatnonzero(inaccurate):
+        means[i] = dist.expect(lambda x: x, lb=edges[i], ub=edges[i + 1], conditional=True)
+        squares[i] = dist.expect(lambda x: x**2, lb=edges[i], ub=edges[i + 1], conditional=True)
+    return (levels, edges, means, squares)
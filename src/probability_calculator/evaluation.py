@@ -0,0 +1,151 @@
+import json
+import time
+from fractions import Fraction
+from typing import List, Union
+import numpy as np
+from .part import _Part
+from .random_variables import RandomVariable
+from .numeric_random_variables import NumericRandomVariable
+
+# lattice cases: name -> (integer values, probabilities, number of independent copies which are summed up)
+cases = {
+    "dice": ([1, 2, 3, 4, 5, 6], [Fraction(1, 6)] * 6, 40),
+    "skewed": ([0, 1, 10], [Fraction(90, 100), Fraction(9, 100), Fraction(1, 100)], 60),
+    "coin": ([-1, 1], [Fraction(1, 2), Fraction(1, 2)], 200),
+}
+
+# bounds may miss the true cdf by this much due to float rounding before it counts as a violation
+violationTolerance = 1e-12
+
+
+def _groundTruth(values: List[int], probs: List[Fraction], n: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    returns the integer support and the cdf of the sum of n independent copies by convolution
+    """
+    offset = min(values)
+    pmf = np.zeros(max(values) - offset + 1)
+    for (v, p) in zip(values, probs):
+        pmf[v - offset] += float(p)
+
+    result = np.ones(1)
+    power = pmf
+    # binary powers keep the number of convolutions logarithmic in n
+    k = n
+    while k > 0:
+        if k % 2 == 1:
+            result = np.convolve(result, power)
+        k //= 2
+        if k > 0:
+            power = np.convolve(power, power)
+
+    support = np.arange(len(result)) + n * offset
+    return (support, np.minimum(np.cumsum(result), 1.))
+
+
+def _setting(engine: str, goalPartCount: int, maxMomentDenominator: Union[int, None]):
+    """
+    applies a setting and returns a function restoring the previous one
+    """
+    cls = RandomVariable if engine == "exact" else NumericRandomVariable
+    previous = (cls.goalPartCount, _Part.maxMomentDenominator)
+    cls.goalPartCount = goalPartCount
+    if maxMomentDenominator is not None:
+        _Part.maxMomentDenominator = maxMomentDenominator
+
+    def restore():
+        (cls.goalPartCount, _Part.maxMomentDenominator) = previous
+    return restore
+
+
+def evaluate(
+        case: str,
+        engine: str = "numeric",
+        goalPartCount: Union[int, None] = None,
+        maxMomentDenominator: Union[int, None] = None) -> dict:
+    """
+    computes the sum of a lattice case with the engine ("exact" or "numeric") at the given setting
+    and compares the cdf bounds at all lattice points and midpoints with the ground truth
+    """
+    (values, probs, n) = cases[case]
+    cls = RandomVariable if engine == "exact" else NumericRandomVariable
+    if goalPartCount is None:
+        goalPartCount = cls.goalPartCount
+    restore = _setting(engine, goalPartCount, maxMomentDenominator)
+    try:
+        start = time.time()
+        if engine == "exact":
+            var = RandomVariable.from_arrays(values, probs) * n
+        else:
+            var = NumericRandomVariable.from_arrays(values, [float(p) for p in probs]) * n
+        seconds = time.time() - start
+    finally:
+        restore()
+
+    (support, truth) = _groundTruth(values, probs, n)
+    # the true cdf jumps at the lattice points and is constant in between
+    points = np.concatenate((support, support + 0.5))
+    if engine == "exact":
+        (lower, upper) = var.cdf_table([Fraction(int(2 * p), 2) for p in points])
+    else:
+        (lower, upper) = var.cdf_table(points)
+    lower = lower.astype(float)
+    upper = upper.astype(float)
+
+    right = np.concatenate((truth, truth))
+    middle = len(support)
+
+    return {
+        "case": case,
+        "engine": engine,
+        "goalPartCount": goalPartCount,
+        "maxMomentDenominator": (maxMomentDenominator or _Part.maxMomentDenominator) if engine == "exact" else None,
+        "parts": len(var._parts),
+        "seconds": seconds,
+        "max_width": float(np.max(upper - lower)),
+        # distance of the middle of the bounds to the true cdf between the lattice points
+        "max_error": float(np.max(np.abs((lower[middle:] + upper[middle:]) / 2 - right[middle:]))),
+        # a positive violation means that the true cdf is outside of the bounds
+        # up to the tolerance for the rounding of the float conversions and the numeric engine
+        "max_violation": float(max(np.max(lower - right), np.max(right - upper), violationTolerance) - violationTolerance),
+    }
+
+
+def run(
+        case_names: Union[List[str], None] = None,
+        engines: List[str] = ["exact", "numeric"],
+        goalPartCounts: List[int] = [50, 200, 800],
+        maxMomentDenominators: List[Union[int, None]] = [None]) -> List[dict]:
+    """
+    evaluates all combinations of cases, engines and settings,
+    maxMomentDenominators only affect the exact engine
+    """
+    rows = []
+    for case in case_names or list(cases):
+        for engine in engines:
+            for goalPartCount in goalPartCounts:
+                for maxMomentDenominator in (maxMomentDenominators if engine == "exact" else [None]):
+                    rows.append(evaluate(case, engine, goalPartCount, maxMomentDenominator))
+    return rows
+
+
+def format_table(rows: List[dict]) -> str:
+    columns = list(rows[0])
+    cells = [[("%.3g" % row[c]) if isinstance(row[c], float) else str(row[c]) for c in columns] for row in rows]
+    widths = [max(len(c), *(len(r[i]) for r in cells)) for (i, c) in enumerate(columns)]
+    lines = ["  ".join(c.rjust(w) for (c, w) in zip(columns, widths))]
+    lines += ["  ".join(cell.rjust(w) for (cell, w) in zip(r, widths)) for r in cells]
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="accuracy versus time of the engines on lattice cases")
+    parser.add_argument("--cases", nargs="*", choices=list(cases))
+    parser.add_argument("--engines", nargs="*", default=["exact", "numeric"], choices=["exact", "numeric"])
+    parser.add_argument("--goal", nargs="*", type=int, default=[50, 200, 800], help="goalPartCount values")
+    parser.add_argument("--denominators", nargs="*", type=int, default=None, help="maxMomentDenominator values")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    arguments = parser.parse_args()
+
+    rows = run(arguments.cases, arguments.engines, arguments.goal, arguments.denominators or [None])
+    print(json.dumps(rows, indent=2) if arguments.json else format_table(rows))
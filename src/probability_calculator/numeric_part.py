@@ -1,6 +1,7 @@
 from typing import TypedDict, List
 from math import log, sqrt, atan, inf, exp
 from numpy import logaddexp
+import numpy as np
 
 NumericOutcome = TypedDict("NumericOutcome", {"p": float, "value": float})
 
@@ -39,16 +40,20 @@ class _Part():
             return (-inf, -inf)
 
         d = self._square - self._mean**2
-        if d <= 0 or value >= self._max:
-            # d == 0 is a corner case where there is no variance
-            # should imply _min = _mean = _max
+        if value >= self._max:
             return (self._logp, self._logp)
 
+        if d <= 0:
+            # d == 0 is a corner case where there is no variance
+            # all probability is at _mean, but rounding can leave _mean a few ulps above a point at _min
+            return (self._logp, self._logp) if value >= self._mean else (-inf, self._logp)
+
         # as d > 0, _max - _mean > 0 and _mean - _min > 0
         dmaxmean = self._max - self._mean
         bound1 = self._mean - d / dmaxmean
         dmeanvalue = self._mean - value
-        if value <= bound1:
+        # value == _min can only be above bound1 due to rounding
+        if value <= bound1 or value <= self._min:
             return (-inf, self._logp - log(1 + dmeanvalue**2 / d))
 
         dmeanmin = self._mean - self._min
@@ -58,7 +63,10 @@ class _Part():
             dmaxvalue = self._max - value
             dvaluemin = value - self._min
             com = (d - dmaxmean*dmeanvalue)/dmaxmin
-            return (self._logp+log(com/dvaluemin), self._logp+log((dmaxmean - com)/dmaxvalue))
+            lower = self._logp+log(com/dvaluemin) if com > 0 else -inf
+            # rounding can make the upper bound vanish for values just below _max, p is always an upper bound
+            upper = (dmaxmean - com)/dmaxvalue
+            return (lower, self._logp+log(upper) if 0 < upper < 1 else self._logp)
 
         return (self._logp - log(1 + d / dmeanvalue**2), self._logp)
 
@@ -136,6 +144,21 @@ class _Part():
 
         return _Part(logp, mean, square, min_value, max_value)
 
+    @staticmethod
+    def _clamped(logp: float, mean: float, square: float, min_value: float, max_value: float) -> "_Part":
+        """
+        creates a part from values computed with numpy arrays, where squares can differ
+        in the last digit from python floats, so the clamping is repeated here
+        """
+        mean = max(mean, min_value)
+        mean = min(mean, max_value)
+        square = max(square, mean**2)
+        square = min(square, mean**2 + (max_value - mean)*(mean - min_value))
+        return _Part(logp, mean, square, min_value, max_value)
+
+    def __neg__(self):
+        return _Part(self._logp, -self._mean, self._square, -self._max, -self._min)
+
     def __mul__(self, other):
         if not isinstance(other, _Part):
             return NotImplemented
@@ -160,7 +183,7 @@ class _Part():
         diff = (self._square - self._mean**2) / (self._max - self._min)
         p = exp(self._logp)
         p_min = p * diff / (self._mean - self._min)
-        p_max = diff / (self._max - self._mean)
+        p_max = p * diff / (self._max - self._mean)
         p_mean = p - p_min - p_max
 
         outcomes = []
@@ -205,3 +228,232 @@ class _Part():
             min_value,
             max_value
         )
+
+
+# vectorized versions of the part computations, working on columns of parts
+# (numpy arrays which broadcast against each other) with p instead of logp
+
+def _partialCdfArrays(p, mean, square, min, max, value) -> tuple[np.ndarray, np.ndarray]:
+    """
+    returns lower and upper bounds on the (partial) cdf for columns of parts, see _Part.partial_logcdf
+    """
+    d = square - mean**2
+    below = value < min
+    full = ~below & ((value >= max) | ((d <= 0) & (value >= mean)))
+    inside = ~below & ~full & (d > 0)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        dmaxmean = max - mean
+        dmeanmin = mean - min
+        dmeanvalue = mean - value
+        region1 = inside & ((value <= mean - d / dmaxmean) | (value <= min))
+        region2 = inside & ~region1 & (value <= mean + d / dmeanmin)
+        region3 = inside & ~region1 & ~region2
+        com = (d - dmaxmean * dmeanvalue) / (max - min)
+        lower = np.where(full, p, 0.)
+        lower = np.where(region2, p * np.maximum(com, 0.) / (value - min), lower)
+        lower = np.where(region3, p / (1 + d / dmeanvalue**2), lower)
+        # without variance rounding can leave the mean a few ulps above a point at min
+        upper = np.where(full | region3 | ~below & (d <= 0), p, 0.)
+        upper = np.where(region1, p / (1 + dmeanvalue**2 / d), upper)
+        share = (dmaxmean - com) / (max - value)
+        upper = np.where(region2, p * np.where((0 < share) & (share < 1), share, 1.), upper)
+
+    return (lower, upper)
+
+
+def _cdfUncertaintyArrays(mean, square, min, max, exact_upper=True) -> np.ndarray:
+    """
+    columns version of _Part.cdf_uncertainty
+    """
+    d = square - mean**2
+    dmaxmin = max - min
+    dmaxmean = max - mean
+    dmeanmin = mean - min
+    dupper = dmaxmean * dmeanmin
+    zero = (d <= 0) | (dmaxmin <= 0)
+    if exact_upper:
+        zero = zero | (d >= dupper)
+    else:
+        d = np.where(d >= dupper, d / 2, d)
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        I = np.log((dupper**2 + d**2 + d * (dmaxmean**2 + dmeanmin**2)) / (dupper - d)**2)
+        ret = I * (dupper - d) / dmaxmin
+        sqrtd = np.sqrt(d)
+        ret = ret + sqrtd * (np.arctan(-sqrtd / dmeanmin) - np.arctan(-dmaxmean / sqrtd))
+        ret = ret + sqrtd * (np.arctan(-sqrtd / dmaxmean) - np.arctan(-dmeanmin / sqrtd))
+
+    return np.where(zero, 0., ret)
+
+
+def _mergeArrays(part1, part2):
+    """
+    columns version of _Part.merge, parts are given as tuples (logp, mean, square, min, max) of arrays
+    """
+    (logp1, mean1, square1, min1, max1) = part1
+    (logp2, mean2, square2, min2, max2) = part2
+    min_value = np.minimum(min1, min2)
+    max_value = np.maximum(max1, max2)
+    logp = np.logaddexp(logp1, logp2)
+    with np.errstate(invalid="ignore"):
+        factor1 = np.nan_to_num(np.exp(logp1 - logp))
+        factor2 = np.nan_to_num(np.exp(logp2 - logp))
+    ex = np.clip(factor1 * mean1 + factor2 * mean2, min_value, max_value)
+    exx = np.maximum(factor1 * square1 + factor2 * square2, ex**2)
+    exx = np.minimum(exx, ex**2 + (max_value - ex) * (ex - min_value))
+    return (logp, ex, exx, min_value, max_value)
+
+
+def _mapArrays(f, mean, square, min, max, monotone="increasing", breakpoints=(), derivative=None, second_derivative=None):
+    """
+    maps columns of parts with the vectorized function f, which is increasing, decreasing or,
+    for monotone="piecewise", continuous and monotone between the breakpoints.
+    The range of the parts is mapped exactly. The true moments of a mapped part with variance d are only known
+    to lie in a box: with c = f(mean), Taylor's theorem gives E[f(X)] - c in [min f'', max f''] * d / 2
+    and E[(f(X) - c)^2] in [min f'^2, max f'^2] * d, where derivative and second_derivative
+    have to be monotone between the breakpoints so that their extremes are taken at the ends of the part
+    and at both sides of the breakpoints inside. For parts containing a breakpoint E[f(X)] - c is only bounded by
+    (max f' - min f') / 2 * sqrt(d) and without derivatives the box is the whole new range.
+    The mapped part gets the center of the box and its largest E[(f(X) - c)^2],
+    or the three point estimate on min, mean and max without derivatives, and a weight t such that
+    for every true distribution T with moments in the box some (1 - t) * T + t * H on the new range
+    has the mapped moments. The cdf of the mapped part then is within t * p of the true one.
+    As mass far out in the range adds much variance, t is small if the box is small compared to the range.
+    Returns the new mean, square, min and max and the weights t, which are 0 for single outcomes.
+    """
+    d = np.maximum(square - mean**2, 0.)
+    dmeanmin = mean - min
+    dmaxmean = max - mean
+    dmaxmin = max - min
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weight_min = np.where(dmeanmin > 0, d / (dmeanmin * dmaxmin), 0.)
+        weight_max = np.where(dmaxmean > 0, d / (dmaxmean * dmaxmin), 0.)
+    weight_mean = np.maximum(1 - weight_min - weight_max, 0.)
+
+    (f_min, f_mean, f_max) = (f(min), f(mean), f(max))
+    smooth = np.full(np.shape(min), True)
+
+    if monotone == "increasing":
+        (new_min, new_max) = (f_min, f_max)
+    elif monotone == "decreasing":
+        (new_min, new_max) = (f_max, f_min)
+    elif monotone == "piecewise":
+        # the extreme values are taken at the ends of the part or at the breakpoints inside
+        new_min = np.minimum(f_min, f_max)
+        new_max = np.maximum(f_min, f_max)
+        for breakpoint in breakpoints:
+            inside = (min < breakpoint) & (breakpoint < max)
+            f_breakpoint = f(np.full(np.shape(min), float(breakpoint)))
+            new_min = np.where(inside, np.minimum(new_min, f_breakpoint), new_min)
+            new_max = np.where(inside, np.maximum(new_max, f_breakpoint), new_max)
+            smooth = smooth & ~inside
+    else:
+        raise Exception("unknown monotone %s" % monotone)
+
+    # moments relative to c = f(mean), the moment space is low <= x <= high, x^2 <= y <= (low + high) * x - low * high
+    low = np.minimum(new_min - f_mean, 0.)
+    high = np.maximum(new_max - f_mean, 0.)
+    box = [low, high, np.zeros(np.shape(min)), np.maximum(low**2, high**2)]
+    x = weight_min * (f_min - f_mean) + weight_max * (f_max - f_mean)
+    y = weight_min * (f_min - f_mean)**2 + weight_max * (f_max - f_mean)**2
+    if derivative is not None and second_derivative is not None:
+        first = [derivative(min), derivative(max)]
+        if monotone == "piecewise":
+            for breakpoint in breakpoints:
+                inside = (min < breakpoint) & (breakpoint < max)
+                for side in (-np.inf, np.inf):
+                    first_breakpoint = derivative(np.full(np.shape(min), np.nextafter(float(breakpoint), side)))
+                    first.append(np.where(inside, first_breakpoint, first[0]))
+        (first_low, first_high) = (np.minimum.reduce(first), np.maximum.reduce(first))
+        (second_min, second_max) = (second_derivative(min), second_derivative(max))
+        # |f(x) - c - s * (x - mean)| <= (max f' - min f') / 2 * |x - mean| for the middle slope s
+        lipschitz = (first_high - first_low) / 2 * np.sqrt(d)
+        box = [
+            np.where(smooth, np.minimum(second_min, second_max) * d / 2, -lipschitz),
+            np.where(smooth, np.maximum(second_min, second_max) * d / 2, lipschitz),
+            np.where(first_low * first_high <= 0, 0., np.minimum(first_low**2, first_high**2)) * d,
+            np.maximum(first_low**2, first_high**2) * d
+        ]
+        x = (box[0] + box[1]) / 2
+        y = box[3]
+    # a single outcome is mapped exactly
+    box = [np.where(d > 0, b, 0.) for b in box]
+
+    x = np.clip(x, low, high)
+    y = np.clip(y, x**2, np.maximum((low + high) * x - low * high, x**2))
+    limit = np.full(np.shape(min), np.inf)
+    for corner_x in box[:2]:
+        for corner_y in box[2:]:
+            limit = np.minimum(limit, _rayLimitArrays(x, y, x - corner_x, y - corner_y, low, high))
+    t = 1 / (1 + limit)
+
+    new_mean = np.clip(f_mean + x, new_min, new_max)
+    new_square = np.maximum(f_mean**2 + 2 * f_mean * x + y, new_mean**2)
+    new_square = np.minimum(new_square, new_mean**2 + (new_max - new_mean) * (new_mean - new_min))
+    return (new_mean, new_square, new_min, new_max, t)
+
+
+def _rayLimitArrays(x, y, dx, dy, low, high):
+    """
+    returns the largest lambda >= 0 for which (x, y) + lambda * (dx, dy) lies in the moment space
+    low <= x <= high, x^2 <= y <= (low + high) * x - low * high, (x, y) has to lie in it
+    """
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        limit = np.where(dx < 0, (x - low) / -dx, np.inf)
+        limit = np.minimum(limit, np.where(dx > 0, (high - x) / dx, np.inf))
+        chord = np.maximum((low + high) * x - low * high - y, 0.)
+        slope = (low + high) * dx - dy
+        limit = np.minimum(limit, np.where(slope < 0, chord / -slope, np.inf))
+        # largest root of q + b * lambda - dx^2 * lambda^2, in the numerically stable form for each sign of b
+        q = np.maximum(y - x**2, 0.)
+        b = dy - 2 * x * dx
+        root = np.sqrt(b**2 + 4 * dx**2 * q)
+        root = np.where(b >= 0, (b + root) / (2 * dx**2), 2 * q / (root - b))
+        limit = np.minimum(limit, np.nan_to_num(root, nan=np.inf))
+    return np.maximum(limit, 0.)
+
+
+def _maxOverlapArrays(p, min, max) -> float:
+    """
+    returns the largest total of p over parts whose ranges [min, max) contain a common value.
+    With p the probability of the parts times their weights from _mapArrays this bounds the distance between
+    the true cdf and the cdf of some distribution with the mapped parts
+    """
+    if len(p) == 0:
+        return 0.
+    by_min = np.argsort(min, kind="stable")
+    by_max = np.argsort(max, kind="stable")
+    starts = min[by_min]
+    ends = max[by_max]
+    started = np.cumsum(p[by_min])
+    ended = np.concatenate(([0.], np.cumsum(p[by_max])))
+    # the overlap only grows at the start of a range
+    active = started[np.searchsorted(starts, starts, side="right") - 1] - ended[np.searchsorted(ends, starts, side="right")]
+    return float(np.max(active))
+
+
+def _inverseBracketArrays(f, increasing: bool, value, low: float, high: float, iterations: int = 100):
+    """
+    returns arrays (left, right) with left < right, between which the monotone function f crosses each value,
+    i.e. f(x) <= value holds for x <= left and not for x >= right if f is increasing and the other way round
+    if it is decreasing. Values outside of f([low, high]) give -inf or inf as left or right.
+    """
+    value = np.asarray(value, dtype=float)
+
+    def onLeft(x):
+        return (f(x) <= value) == increasing
+
+    left = np.where(onLeft(np.full(value.shape, low)), low, -np.inf)
+    right = np.where(onLeft(np.full(value.shape, high)), np.inf, high)
+    left = np.where(right == np.inf, high, left)
+    right = np.where(left == -np.inf, low, right)
+    bisect = np.isfinite(left) & np.isfinite(right)
+    for _ in range(iterations):
+        middle = np.where(bisect, (left + right) / 2, left)
+        bisect = bisect & (left < middle) & (middle < right)
+        if not np.any(bisect):
+            break
+        on_left = onLeft(middle)
+        left = np.where(bisect & on_left, middle, left)
+        right = np.where(bisect & ~on_left, middle, right)
+    return (left, right)
@@ -1,14 +1,43 @@
+import heapq
 import itertools
+import threading
 from fractions import Fraction
 from typing import List, Literal, Union
 from . import numeric_part
 import matplotlib.pyplot as plt
 from matplotlib.patches import Rectangle
 import time
-from math import log, exp, inf
+from functools import reduce
+from math import log, exp, inf, sqrt, gcd
 from numpy import logaddexp
+import numpy as np
+from scipy.stats import norm, truncnorm
+from .sampling import _aliasTable, _sampleAlias
+from .continuous import _continuousBuckets
+from .anytime import _goalPartCount
+from .tails import _tailExpectationBounds, _shortfallAtoms, _expectedShortfall, _mgfCoefficients, _logMgfBounds
 
 class NumericRandomVariable:
+    goalPartCount = 200
+    # parts with a smaller probability are folded into a single residual part, 0 disables pruning
+    pruneThreshold = 0.
+    _residual = None
+    # n-fold sums X * n with n >= cltThreshold use a normal approximation, None disables it
+    cltThreshold = None
+    # compound uses dense convolutions if the lattice of the values has at most this many points per part
+    latticeSpanFactor = 4
+    # additional error on the cdf bounds, e.g. from the normal approximation
+    _cdfError = 0.
+    # (X, f, monotone, breakpoints) for f(X) from apply, its cdf bounds are also transferred from X
+    _source = None
+    # lazily built caches, the parts themselves are never modified after construction
+    _sampler = None
+    _indexCache = None
+    _tailCache = None
+    # list of (threshold, weight), merges of parts straddling a threshold are penalized by its weight
+    _focus = None
+    _cacheLock = threading.RLock()
+
     def __init__(self, outcomes: List[numeric_part.NumericOutcome] = [], _parts: List[numeric_part._Part] = []):
         parts = []
         for p in _parts:
@@ -24,13 +53,193 @@ class NumericRandomVariable:
                 value
             ))
 
-        self._parts = NumericRandomVariable._simplifyParts(parts)
+        (self._parts, self._residual) = NumericRandomVariable._pruneAndSimplifyParts(parts)
+
+    @staticmethod
+    def from_arrays(values, probs) -> "NumericRandomVariable":
+        """
+        Generates a random variable from an array of values and an array of probabilities.
+        Equal values are aggregated, so values do not need to be unique.
+        """
+        return NumericRandomVariable._fromParts(NumericRandomVariable._partsFromArrays(values, probs))
+
+    @staticmethod
+    def from_continuous(dist, parts: Union[int, None] = None, tail_mass: float = 0.) -> "NumericRandomVariable":
+        """
+        Discretizes a continuous scipy.stats distribution into parts of equal probability.
+        Each part gets the bucket between two quantiles as [min, max] and the conditional moments.
+        For unbounded distributions, tail_mass > 0 is needed: this probability is cut off
+        (half on each side) and added to the error of the cdf bounds.
+        """
+        (levels, edges, means, squares) = _continuousBuckets(dist, parts or NumericRandomVariable.goalPartCount, tail_mass)
+        min_values = edges[:-1]
+        max_values = edges[1:]
+        means = np.clip(means, min_values, max_values)
+        squares = np.maximum(squares, means**2)
+        squares = np.minimum(squares, means**2 + (max_values - means) * (means - min_values))
+        logp = -log(len(means))
+        ret = NumericRandomVariable._fromParts([
+            numeric_part._Part._clamped(logp, *args)
+            for args in zip(means.tolist(), squares.tolist(), min_values.tolist(), max_values.tolist())
+        ])
+        ret._cdfError = tail_mass
+        return ret
+
+    @staticmethod
+    def _fromParts(parts: List[numeric_part._Part]) -> "NumericRandomVariable":
+        """
+        creates a random variable from parts which are already simplified and sorted by min
+        """
+        var = NumericRandomVariable.__new__(NumericRandomVariable)
+        var._parts = parts
+        return var
+
+    @staticmethod
+    def _partsFromArrays(values, probs) -> List[numeric_part._Part]:
+        values = np.asarray(values, dtype=float)
+        probs = np.asarray(probs, dtype=float)
+        if values.shape != probs.shape:
+            raise Exception("values and probs need to have the same length")
+        if len(values) == 0:
+            return []
+
+        order = np.argsort(values, kind="stable")
+        values = values[order]
+        probs = probs[order]
+        starts = np.flatnonzero(np.concatenate(([True], values[1:] != values[:-1])))
+        values = values[starts]
+        probs = np.add.reduceat(probs, starts)
+        keep = probs > 0
+        values = values[keep]
+        probs = probs[keep]
+
+        goalPartCount = NumericRandomVariable.goalPartCount
+        if len(values) <= goalPartCount:
+            return [
+                numeric_part._Part(logp, v, v**2, v, v)
+                for (logp, v) in zip(np.log(probs).tolist(), values.tolist())
+            ]
+
+        # group the sorted values into buckets of roughly equal probability
+        # each bucket gets the exact moments, so the cdf bounds stay valid
+        cumulative = np.cumsum(probs) - probs
+        group = np.floor(cumulative * (goalPartCount / (cumulative[-1] + probs[-1])))
+        starts = np.flatnonzero(np.concatenate(([True], group[1:] != group[:-1])))
+        ends = np.concatenate((starts[1:], [len(values)])) - 1
+        p = np.add.reduceat(probs, starts)
+        min_values = values[starts]
+        max_values = values[ends]
+        # make sure that the rounding does not make problems with the numbers
+        ex = np.clip(np.add.reduceat(probs * values, starts) / p, min_values, max_values)
+        exx = np.maximum(np.add.reduceat(probs * values**2, starts) / p, ex**2)
+        exx = np.minimum(exx, ex**2 + (max_values - ex) * (ex - min_values))
+        return [
+            numeric_part._Part._clamped(*args)
+            for args in zip(np.log(p).tolist(), ex.tolist(), exx.tolist(), min_values.tolist(), max_values.tolist())
+        ]
 
     def outcomes(self):
-        outcomes: List[numeric_part.NumericOutcome] = list(
-            itertools.chain(*[part.outcomes() for part in self._parts]))
+        outcomes: List[numeric_part.NumericOutcome] = list(self.iter_outcomes())
         return outcomes
 
+    def iter_outcomes(self):
+        """
+        yields the outcomes part by part without building the full list
+        """
+        return itertools.chain.from_iterable(part.outcomes() for part in self._parts)
+
+    def outcomes_array(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        returns the outcomes as arrays (values, probabilities) sorted by value.
+        Equal values of different parts are aggregated.
+        """
+        p = np.exp(np.fromiter((part._logp for part in self._parts), dtype=float, count=len(self._parts)))
+        mean = np.fromiter((part._mean for part in self._parts), dtype=float, count=len(self._parts))
+        square = np.fromiter((part._square for part in self._parts), dtype=float, count=len(self._parts))
+        min_values = np.fromiter((part._min for part in self._parts), dtype=float, count=len(self._parts))
+        max_values = np.fromiter((part._max for part in self._parts), dtype=float, count=len(self._parts))
+
+        # same three point decomposition as in numeric_part._Part.outcomes
+        spread = (min_values != mean) & (max_values != mean)
+        p_min = np.zeros(len(p))
+        p_max = np.zeros(len(p))
+        diff = p[spread] * (square[spread] - mean[spread]**2) / (max_values[spread] - min_values[spread])
+        p_min[spread] = diff / (mean[spread] - min_values[spread])
+        p_max[spread] = diff / (max_values[spread] - mean[spread])
+        p_mean = p - p_min - p_max
+
+        values = np.concatenate((min_values, mean, max_values))
+        probs = np.concatenate((p_min, p_mean, p_max))
+        keep = probs > 0
+        values = values[keep]
+        probs = probs[keep]
+        order = np.argsort(values, kind="stable")
+        values = values[order]
+        probs = probs[order]
+        if len(values) > 0:
+            starts = np.flatnonzero(np.concatenate(([True], values[1:] != values[:-1])))
+            values = values[starts]
+            probs = np.add.reduceat(probs, starts)
+
+        return (values, probs)
+
+    def sample(self, size=None, rng=None):
+        """
+        draws independent samples of the random variable using an alias table
+        over the outcomes, which is built on the first call and then reused.
+        rng can be anything accepted by numpy.random.default_rng.
+        """
+        def build():
+            (values, probs) = self.outcomes_array()
+            (accept, alias) = _aliasTable(probs)
+            return (values, accept, alias)
+
+        (values, accept, alias) = self._cached("_sampler", build)
+        return values[_sampleAlias(accept, alias, size, rng)]
+
+    def _cached(self, name: str, build):
+        """
+        returns the lazily built cache attribute name and builds it with build() on the first call.
+        The parts of a random variable are never modified after construction,
+        so the caches can be shared between threads once they are built.
+        """
+        value = getattr(self, name)
+        if value is None:
+            with NumericRandomVariable._cacheLock:
+                value = getattr(self, name)
+                if value is None:
+                    value = build()
+                    setattr(self, name, value)
+        return value
+
+    def _index(self):
+        """
+        returns (mins, cumulative p by min, sorted maxs, cumulative p by max, order of the parts by max, columns)
+        for answering cdf and quantil queries with a binary search or vectorized,
+        where columns are the (p, mean, square, min, max) arrays of the parts
+        """
+        def build():
+            parts = self._parts
+            columns = tuple(np.array(column, dtype=float) for column in zip(*(
+                (exp(part._logp), part._mean, part._square, part._min, part._max) for part in parts)))
+            (p, _, _, mins, maxs) = columns
+            by_max = np.argsort(maxs, kind="stable")
+            return (mins, np.cumsum(p), maxs[by_max], np.cumsum(p[by_max]), by_max.tolist(), columns)
+
+        return self._cached("_indexCache", build)
+
+    def mean(self) -> float:
+        mean = 0.
+        for part in self._parts:
+            mean += part._mean * exp(part._logp)
+        return mean
+
+    def square(self) -> float:
+        square = 0.
+        for part in self._parts:
+            square += part._square * exp(part._logp)
+        return square
+
     def cdf(self, value: float) -> tuple[float, float]:
         """
         returns lower and upper bounds on the cumulative distribution function of the random variable
@@ -45,21 +254,539 @@ class NumericRandomVariable:
             lower = logaddexp(lower, l)
             upper = logaddexp(upper, u)
 
-        return (exp(lower), exp(upper))
+        if self._cdfError > 0:
+            (lower, upper) = (max(exp(lower) - self._cdfError, 0.), min(exp(upper) + self._cdfError, 1.))
+        else:
+            (lower, upper) = (exp(lower), exp(upper))
+        if self._source is not None:
+            (source_lower, source_upper) = self._sourceCdfTable([value])
+            (lower, upper) = (max(lower, float(source_lower[0])), min(upper, float(source_upper[0])))
+        return (lower, upper)
+
+    def _sourceCdfTable(self, points) -> tuple[np.ndarray, np.ndarray]:
+        """
+        returns cdf bounds of f(X) for the X and monotone f of apply from P(f(X) <= y) = P(X <= f^-1(y)),
+        summed over the pieces between the breakpoints, on which f is monotone,
+        so they do not depend on the bounded moments of the mapped parts
+        """
+        (source, f, monotone, breakpoints) = self._source
+        (low, high) = source._minmax()
+        points = np.asarray(points, dtype=float)
+
+        def sourceCdf(value):
+            # the cdf of X is exactly 0 at -inf and 1 at inf, also with an additional error
+            (lower, upper) = source.cdf_table(value)
+            return (np.where(value == np.inf, 1., lower), np.where(value == -np.inf, 0., upper))
+
+        edges = [-np.inf] + sorted(float(b) for b in breakpoints if low < b < high) + [np.inf]
+        lower = np.zeros(len(points))
+        upper = np.zeros(len(points))
+        for (start, end) in zip(edges[:-1], edges[1:]):
+            (piece_low, piece_high) = (max(start, low), min(end, high))
+            if monotone == "piecewise":
+                increasing = bool(f(np.array([piece_high]))[0] >= f(np.array([piece_low]))[0])
+            else:
+                increasing = monotone == "increasing"
+            (left, right) = numeric_part._inverseBracketArrays(f, increasing, points, piece_low, piece_high)
+            (start_lower, start_upper) = sourceCdf(np.full(len(points), start))
+            (end_lower, end_upper) = sourceCdf(np.full(len(points), end))
+            if increasing:
+                # start < X <= left implies f(X) <= y, which implies X < right for X in the piece (start, end]
+                (left_lower, _) = sourceCdf(left)
+                (_, right_upper) = sourceCdf(np.where(right == np.inf, end, right))
+                lower += np.maximum(left_lower - start_upper, 0.)
+                upper += np.maximum(right_upper - start_lower, 0.)
+            else:
+                # right <= X <= end implies f(X) <= y, which implies X > left for X in the piece (start, end]
+                (_, right_upper) = sourceCdf(right)
+                (left_lower, _) = sourceCdf(np.where(left == -np.inf, start, left))
+                lower += np.maximum(end_lower - right_upper, 0.)
+                upper += np.maximum(end_upper - left_lower, 0.)
+        return (np.minimum(lower, 1.), np.minimum(upper, 1.))
+
+    def _cdfSweep(self, values, strict: bool = False):
+        """
+        yields the cdf bounds for ascending values in a single sweep over the parts.
+        Parts which are completely below the current value are only summed up once,
+        so only the parts containing the current value have to be evaluated.
+        If strict, the bounds are on the left limits P(X < value) instead,
+        where the lower bounds only count the parts below the value.
+        """
+        parts = self._parts
+        by_max = self._index()[4]
+        active = {}
+        done = 0.
+        i_min = 0
+        i_max = 0
+        for value in values:
+            while i_min < len(parts) and (parts[i_min]._min < value or not strict and parts[i_min]._min == value):
+                active[i_min] = parts[i_min]
+                i_min += 1
+            while i_max < len(parts) and (
+                    parts[by_max[i_max]]._max < value or not strict and parts[by_max[i_max]]._max == value):
+                done += exp(active.pop(by_max[i_max])._logp)
+                i_max += 1
+
+            lower = done
+            upper = done
+            for part in active.values():
+                (l, u) = part.partial_logcdf(value)
+                if not strict:
+                    lower += exp(l)
+                upper += exp(u)
+            yield (max(lower - self._cdfError, 0.), min(upper + self._cdfError, 1.))
+
+    def cdf_table(self, points) -> tuple[np.ndarray, np.ndarray]:
+        """
+        returns arrays with lower and upper bounds on the cumulative distribution function at all points,
+        computed in a single sweep over the parts
+        """
+        points = np.asarray(points, dtype=float)
+        order = np.argsort(points, kind="stable")
+        lower = np.empty(len(points))
+        upper = np.empty(len(points))
+        for (i, (l, u)) in zip(order.tolist(), self._cdfSweep(points[order].tolist())):
+            lower[i] = l
+            upper[i] = u
+        if self._source is not None:
+            (source_lower, source_upper) = self._sourceCdfTable(points)
+            (lower, upper) = (np.maximum(lower, source_lower), np.minimum(upper, source_upper))
+        return (lower, upper)
+
+    def histogram_bounds(self, bins) -> tuple[np.ndarray, np.ndarray]:
+        """
+        returns arrays with lower and upper bounds on the probability of each bin (bins[i], bins[i + 1]],
+        where bins are the ascending bin edges
+        """
+        return NumericRandomVariable._binBounds(*self.cdf_table(bins))
+
+    @staticmethod
+    def _binBounds(lower: np.ndarray, upper: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # bounds on the differences of consecutive cdf values
+        return (np.maximum(lower[1:] - upper[:-1], 0.), np.minimum(upper[1:] - lower[:-1], 1.))
+
+    def prob_less(self, other: "NumericRandomVariable") -> tuple[float, float]:
+        """
+        returns lower and upper bounds on P(self < other) for independent random variables
+        """
+        # P(self < other) <= sum over the parts of other of p * P(self < part max),
+        # which is exact for point parts, and P(other <= self) = 1 - P(self < other)
+        # is bounded in the same way with P(other <= part max) over the parts of self
+        return (max(1 - other._probLessEqualUpper(self), 0.), self._probLessEqualUpper(other, strict=True))
+
+    def prob_greater(self, other: "NumericRandomVariable") -> tuple[float, float]:
+        """
+        returns lower and upper bounds on P(self > other) for independent random variables
+        """
+        return other.prob_less(self)
+
+    def _probLessEqualUpper(self, other: "NumericRandomVariable", strict: bool = False) -> float:
+        """
+        returns an upper bound on P(self <= other), or on P(self < other) if strict
+        """
+        other_parts = sorted(other._parts, key=lambda part: part._max)
+        ret = 0.
+        for (other_part, (_, upper)) in zip(other_parts, self._cdfSweep((part._max for part in other_parts), strict)):
+            ret += exp(other_part._logp) * upper
+        return min(ret, 1.)
+
+    def quantil_bounds(self, q: float) -> tuple[float, float]:
+        """
+        returns lower and upper bounds on the q quantil of the random variable
+        """
+        (mins, cumulative_min, maxs, cumulative_max, _, _) = self._index()
+        last = len(mins) - 1
+        # below the min of the first part up to which the probability reaches q the cdf is smaller than q,
+        # at the max of the first part (ordered by max) up to which the probability reaches q it is at least q
+        lower = float(mins[min(int(np.searchsorted(cumulative_min, q - self._cdfError)), last)])
+        upper = float(maxs[min(int(np.searchsorted(cumulative_max, q + self._cdfError)), last)])
+        if self._source is not None and self._source[2] == "increasing":
+            # the quantils of f(X) are f of the quantils of X for an increasing f
+            (source, f, _, _) = self._source
+            (source_lower, source_upper) = (float(v) for v in f(np.array(source.quantil_bounds(q))))
+            (lower, upper) = (max(lower, source_lower), min(upper, source_upper))
+        return (lower, upper)
+
+    def query_parallel(self, queries: List[tuple[str, float]], executor, batch_size: int = 1000) -> list:
+        """
+        answers a list of queries like ("cdf", value) or ("quantil_bounds", q) in batches on the executor,
+        e.g. a concurrent.futures.ThreadPoolExecutor, and returns the results in the order of the queries.
+        The cdf queries of a batch are evaluated with numpy, which releases the GIL for the heavy parts.
+        """
+        self._index()
+        futures = [
+            executor.submit(self._queryBatch, queries[start:start + batch_size])
+            for start in range(0, len(queries), batch_size)
+        ]
+        return [result for future in futures for result in future.result()]
+
+    def _queryBatch(self, queries: List[tuple[str, float]]) -> list:
+        results = [None] * len(queries)
+        cdf_indices = [i for (i, (name, _)) in enumerate(queries) if name == "cdf"]
+        if len(cdf_indices) > 0:
+            values = np.array([queries[i][1] for i in cdf_indices], dtype=float)[:, None]
+            (lower, upper) = numeric_part._partialCdfArrays(*self._index()[5], values)
+            lower = np.maximum(np.sum(lower, axis=1) - self._cdfError, 0.)
+            upper = np.minimum(np.sum(upper, axis=1) + self._cdfError, 1.)
+            if self._source is not None:
+                (source_lower, source_upper) = self._sourceCdfTable(values[:, 0])
+                (lower, upper) = (np.maximum(lower, source_lower), np.minimum(upper, source_upper))
+            for (i, l, u) in zip(cdf_indices, lower.tolist(), upper.tolist()):
+                results[i] = (l, u)
+        for (i, (name, value)) in enumerate(queries):
+            if name != "cdf":
+                results[i] = getattr(self, name)(value)
+        return results
+
+    def _tailIndex(self):
+        """
+        returns (suffix sums of p and p * mean of the parts ordered by min, running maximum of their maxs,
+        atoms of the part means, atoms of the two point distributions on min and max) for the tail queries
+        """
+        def build():
+            (p, mean, _, min_value, max_value) = self._index()[5]
+            suffix_p = np.concatenate((np.cumsum(p[::-1])[::-1], [0.]))
+            suffix_pmean = np.concatenate((np.cumsum((p * mean)[::-1])[::-1], [0.]))
+            with np.errstate(divide="ignore", invalid="ignore"):
+                weights = np.where(max_value > min_value, (mean - min_value) / (max_value - min_value), 0.)
+            means = _shortfallAtoms(mean.tolist(), p.tolist())
+            spread = _shortfallAtoms(
+                np.concatenate((min_value, max_value)).tolist(),
+                np.concatenate((p * (1 - weights), p * weights)).tolist())
+            return (suffix_p.tolist(), suffix_pmean.tolist(), np.maximum.accumulate(max_value).tolist(), means, spread)
+
+        return self._cached("_tailCache", build)
+
+    def tail_expectation_bounds(self, t):
+        """
+        returns lower and upper bounds on E[X | X > t] or None if X > t is impossible.
+        For an array of thresholds t, arrays of bounds are returned, which are nan where X > t is impossible.
+        """
+        (mins, _, _, _, _, (p, mean, _, min_value, max_value)) = self._index()
+        (suffix_p, suffix_pmean, prefix_max, _, _) = self._tailIndex()
+        thresholds = np.atleast_1d(np.asarray(t, dtype=float))
+        # the parts from k on are completely above t, only the parts before k with max > t straddle t
+        ks = np.searchsorted(mins, thresholds, side="right")
+        lower = np.full(len(thresholds), np.nan)
+        upper = np.full(len(thresholds), np.nan)
+        for (i, (value, k)) in enumerate(zip(thresholds.tolist(), ks.tolist())):
+            straddling = []
+            j = k - 1
+            while j >= 0 and prefix_max[j] > value:
+                if max_value[j] > value:
+                    straddling.append((float(p[j]), float(mean[j]), float(min_value[j]), float(max_value[j])))
+                j -= 1
+            bounds = _tailExpectationBounds(value, suffix_p[k], suffix_pmean[k], straddling)
+            if bounds is not None:
+                (lower[i], upper[i]) = bounds
+
+        if np.ndim(t) == 0:
+            return None if np.isnan(upper[0]) else (float(lower[0]), float(upper[0]))
+        return (lower, upper)
+
+    def expected_shortfall_bounds(self, alpha):
+        """
+        returns lower and upper bounds on the expected shortfall, i.e. the mean of the largest 1 - alpha part
+        of the distribution. Putting the mass of each part at its mean gives the lower bound,
+        putting it at min and max (with the same mean) gives the upper bound.
+        Mass cut off by from_continuous or the normal approximation is not taken into account.
+        For an array of levels alpha, arrays of bounds are returned.
+        """
+        (_, _, _, means, spread) = self._tailIndex()
+        if np.ndim(alpha) == 0:
+            return (_expectedShortfall(means, alpha), _expectedShortfall(spread, alpha))
+        levels = np.asarray(alpha, dtype=float).tolist()
+        return (
+            np.array([_expectedShortfall(means, a) for a in levels]),
+            np.array([_expectedShortfall(spread, a) for a in levels]))
+
+    @staticmethod
+    def chernoff_tail_bound(variables: List["NumericRandomVariable"], t):
+        """
+        Returns an upper bound on P(X_1 + ... + X_n > t) for independent random variables without computing the sum.
+        The exponential moments of the parts are bounded by their p, mean, square and max (Bennett's inequality),
+        they multiply across the sum and the bound exp(log E[exp(lam * S)] - lam * t) is minimized over lam >= 0.
+        The additional errors on the cdf bounds of the variables are added.
+        For an array of thresholds t, an array of bounds is returned.
+        """
+        if len(variables) == 0:
+            raise Exception("at least one random variable is needed for the sum")
+        thresholds = np.atleast_1d(np.asarray(t, dtype=float))
+
+        # repeated variables are only evaluated once, their exponential moments are raised to the power of the count
+        counts = {}
+        for var in variables:
+            counts[id(var)] = (var, counts[id(var)][1] + 1 if id(var) in counts else 1)
+        multiplicity = np.array([k for (_, k) in counts.values()], dtype=float)
+        # all parts in one array, the variables are the segments starting at offsets
+        columns = [var._index()[5] for (var, _) in counts.values()]
+        (p, mean, square, _, max_value) = (np.concatenate(c) for c in zip(*columns))
+        with np.errstate(divide="ignore"):
+            logp = np.log(p)
+        coefficients = _mgfCoefficients(mean, square, max_value)
+        offsets = np.cumsum([0] + [len(c[0]) for c in columns[:-1]])
+        segments = np.repeat(np.arange(len(columns)), [len(c[0]) for c in columns])
+
+        def exponent(lam, t):
+            # log E[exp(lam * S)] - lam * t for arrays lam and t of the same length
+            log_mgf = _logMgfBounds(logp, coefficients, lam[None, :])
+            largest = np.maximum.reduceat(log_mgf, offsets, axis=0)
+            log_mgf = np.log(np.add.reduceat(np.exp(log_mgf - largest[segments]), offsets, axis=0)) + largest
+            return multiplicity @ log_mgf - lam * t
+
+        # the exponent is convex in lam, so a coarse grid brackets the minimum, which is refined by golden section
+        variance = multiplicity @ [np.sum(c[0] * c[2]) - np.sum(c[0] * c[1])**2 for c in columns]
+        grid = np.concatenate(([0.], np.geomspace(1e-3, 1e3, 32) / sqrt(max(variance, 1e-300))))
+        count = len(thresholds)
+        values = exponent(np.repeat(grid, count), np.tile(thresholds, len(grid))).reshape(len(grid), count)
+        best = np.argmin(values, axis=0)
+        minimum = values[best, np.arange(count)]
+        lower = grid[np.maximum(best - 1, 0)]
+        upper = grid[np.minimum(best + 1, len(grid) - 1)]
+        ratio = (sqrt(5) - 1) / 2
+        for _ in range(12):
+            left = upper - ratio * (upper - lower)
+            right = lower + ratio * (upper - lower)
+            both = exponent(np.concatenate((left, right)), np.concatenate((thresholds, thresholds)))
+            (left_value, right_value) = (both[:count], both[count:])
+            minimum = np.minimum(minimum, np.minimum(left_value, right_value))
+            smaller = left_value < right_value
+            (lower, upper) = (np.where(smaller, lower, left), np.where(smaller, right, upper))
+
+        error = sum(var._cdfError for var in variables)
+        bound = np.minimum(np.exp(minimum) + error, 1.)
+        # the sum cannot exceed the sum of the maxima
+        bound = np.where(thresholds >= multiplicity @ [np.max(c[4]) for c in columns], min(error, 1.), bound)
+        return float(bound[0]) if np.ndim(t) == 0 else bound
+
+    def residual_mass(self) -> float:
+        """
+        returns the probability of the residual part, into which parts below pruneThreshold were folded
+        """
+        return 0. if self._residual is None else exp(self._residual._logp)
+
+    def with_focus(self, focus: List[tuple]) -> "NumericRandomVariable":
+        """
+        Returns the same random variable, whose sums are simplified with a focus on the given
+        list of (threshold, weight): merges of parts straddling a threshold are penalized by weight times the absolute value of their heuristic,
+        so the cdf bounds near the thresholds stay tight at the cost of the bounds elsewhere.
+        For a tail focus, give the threshold of the tail, e.g. a high quantil.
+        """
+        ret = NumericRandomVariable._fromParts(self._parts)
+        ret._residual = self._residual
+        ret._cdfError = self._cdfError
+        ret._focus = [(float(t), w) for (t, w) in focus]
+        return ret
+
+    @staticmethod
+    def _combinedFocus(focus1, focus2):
+        if focus1 is None or focus2 is None:
+            return focus1 if focus2 is None else focus2
+        # sums of copies share their focus, which should not be counted twice
+        return focus1 + [f for f in focus2 if f not in focus1]
 
     def __add__(self, other):
         start = time.time()
+        parts1 = [part for part in self._parts if part is not self._residual]
+        parts2 = [part for part in other._parts if part is not other._residual]
         parts = []
-        for part1 in self._parts:
-            for part2 in other._parts:
+        for part1 in parts1:
+            for part2 in parts2:
                 parts.append(part1 + part2)
+
+        # everything involving a residual part stays in the residual, which
+        # costs only O(n + m) instead of adding the residual to each part
+        residual_parts = []
+        if self._residual is not None:
+            residual_parts += [self._residual + part2 for part2 in other._parts]
+        if other._residual is not None:
+            residual_parts += [part1 + other._residual for part1 in parts1]
         #print("array generate %s" % (time.time() - start))
         start2 = time.time()
-        ret = NumericRandomVariable(_parts=parts)
+        ret = NumericRandomVariable._fromParts([])
+        ret._focus = NumericRandomVariable._combinedFocus(self._focus, other._focus)
+        (ret._parts, ret._residual) = NumericRandomVariable._pruneAndSimplifyParts(parts, residual_parts, ret._focus)
+        ret._cdfError = self._cdfError + other._cdfError
         #print("instantiate var %s" % (time.time() - start2))
         #print("add %s" % (time.time() - start))
         return ret
 
+    @staticmethod
+    def sum(variables) -> "NumericRandomVariable":
+        """
+        Adds up the given random variables.
+        Always the two variables with the fewest parts are added first (like in a Huffman code),
+        so the intermediate results stay small and exact as long as possible.
+        """
+        heap = [(len(var._parts), i, var) for (i, var) in enumerate(variables)]
+        if len(heap) == 0:
+            raise Exception("at least one random variable is needed for the sum")
+
+        heapq.heapify(heap)
+        counter = len(heap)
+        while len(heap) > 1:
+            (_, _, var1) = heapq.heappop(heap)
+            (_, _, var2) = heapq.heappop(heap)
+            var = var1 + var2
+            heapq.heappush(heap, (len(var._parts), counter, var))
+            counter += 1
+
+        return heap[0][2]
+
+    @staticmethod
+    def compound(N, X: "NumericRandomVariable") -> "NumericRandomVariable":
+        """
+        Computes the distribution of X_1 + ... + X_N, where the X_i are independent copies of X
+        and the count N is an independent random variable with non negative integer values.
+        N can also be given as a pair (counts, probs), e.g. (k, stats.poisson(300).pmf(k)),
+        which is needed for counts with more than goalPartCount values, as a random variable merges them.
+        Probability missing from probs, e.g. of a cut off tail, is added to the cdf error.
+        If X only has integer values, the probabilities are convolved directly on the lattice.
+        """
+        weights = NumericRandomVariable._countWeights(N)
+        counts = sorted(weights)
+        lattice = X._latticePmf()
+        if lattice is not None:
+            ret = NumericRandomVariable._compoundLattice(weights, lattice)
+            ret._cdfError = NumericRandomVariable._compoundError(N, X, weights)
+            return ret
+
+        multiples = {}
+        powers = [X]
+
+        def multiple(k: int) -> "NumericRandomVariable":
+            # X * k as sum of the cached X * 2^i
+            if k not in multiples:
+                ret = None
+                i = 0
+                while k >> i > 0:
+                    if i == len(powers):
+                        powers.append(powers[-1] + powers[-1])
+                    if (k >> i) & 1:
+                        ret = powers[i] if ret is None else ret + powers[i]
+                    i += 1
+                multiples[k] = ret
+            return multiples[k]
+
+        mixture = []
+        previous_count = 0
+        previous = None
+        for k in counts:
+            logw = log(weights[k])
+            if k == 0:
+                mixture.append(numeric_part._Part(logw, 0., 0., 0., 0.))
+                continue
+
+            # reuse the sum for the previous count, so dense counts cost one addition each
+            current = multiple(k) if previous is None else previous + multiple(k - previous_count)
+            mixture += [numeric_part._Part(p._logp + logw, p._mean, p._square, p._min, p._max) for p in current._parts]
+            if len(mixture) > 2 * _goalPartCount(NumericRandomVariable.goalPartCount):
+                mixture = NumericRandomVariable._simplifyParts(mixture, X._focus)
+            previous_count = k
+            previous = current
+
+        ret = NumericRandomVariable._fromParts([])
+        (ret._parts, ret._residual) = NumericRandomVariable._pruneAndSimplifyParts(mixture, [], X._focus)
+        ret._focus = X._focus
+        ret._cdfError = NumericRandomVariable._compoundError(N, X, weights)
+        return ret
+
+    @staticmethod
+    def _compoundError(N, X, weights: dict):
+        """
+        returns the additional cdf error of compound(N, X):
+        X_1 + ... + X_k is within k times the error of X, so the mixture is within E[N] times that error.
+        Errors of the weights change the mixture by at most the error of N if the cdf of X * k is monotone in k,
+        i.e. if X does not change its sign, and otherwise by at most the error of N for each count.
+        """
+        (min_value, max_value) = X._minmax()
+        factor = 1 if min_value >= 0 or max_value <= 0 else len(weights)
+        return min(sum(k * w for (k, w) in weights.items()) * X._cdfError + factor * NumericRandomVariable._countError(N, weights), 1.)
+
+    @staticmethod
+    def _countWeights(N) -> dict:
+        if isinstance(N, tuple):
+            outcomes = [{"value": k, "p": p} for (k, p) in zip(*N)]
+        else:
+            outcomes = N.outcomes()
+        weights = {}
+        for outcome in outcomes:
+            k = outcome["value"]
+            if k < 0 or k != int(k):
+                raise Exception(
+                    "the count needs to have non negative integer values, "
+                    "pass (counts, probs) for counts with more than goalPartCount values")
+            weights[int(k)] = weights.get(int(k), 0.) + float(outcome["p"])
+        return {k: w for (k, w) in weights.items() if w > 0}
+
+    @staticmethod
+    def _countError(N, weights: dict):
+        # the probability missing from a count given as (counts, probs) is an error of its cdf
+        if isinstance(N, tuple):
+            return max(1. - sum(weights.values()), 0.)
+        return float(N._cdfError)
+
+    def _latticePmf(self) -> Union[tuple[int, int, np.ndarray], None]:
+        """
+        returns (offset, step, pmf) with P(X = step * (offset + i)) = pmf[i] if all parts are points on integers
+        and the lattice has at most latticeSpanFactor times as many points as there are parts, otherwise None
+        """
+        values = []
+        for part in self._parts:
+            if part._min != part._max or part._min != int(part._min):
+                return None
+            values.append(int(part._min))
+
+        # e.g. amounts in whole thousands only need every thousandth point
+        step = gcd(*values) or 1
+        values = [v // step for v in values]
+        offset = min(values)
+        if max(values) - offset + 1 > NumericRandomVariable.latticeSpanFactor * len(values):
+            return None
+        pmf = np.zeros(max(values) - offset + 1)
+        np.add.at(pmf, np.array(values) - offset, np.exp([part._logp for part in self._parts]))
+        return (offset, step, pmf)
+
+    @staticmethod
+    def _compoundLattice(weights: dict, lattice: tuple[int, int, np.ndarray]) -> "NumericRandomVariable":
+        (offset, step, pmf) = lattice
+        counts = sorted(weights)
+        # X * k has values in step * [k * offset, k * (offset + len(pmf) - 1)]
+        lowest = min(k * offset for k in counts)
+        highest = max(k * (offset + len(pmf) - 1) for k in counts)
+        result = np.zeros(highest - lowest + 1)
+        current = np.ones(1)
+        for k in range(counts[-1] + 1):
+            if k > 0:
+                current = np.convolve(current, pmf)
+            if k in weights:
+                start = k * offset - lowest
+                result[start:start + len(current)] += weights[k] * current
+
+        return NumericRandomVariable.from_arrays(step * np.arange(lowest, highest + 1), result)
+
+    def __neg__(self):
+        # mirroring reverses the order of the parts, so the parts are sorted by max afterwards
+        # this is (almost) sorted by min as well, which makes the sort linear in most cases
+        parts = []
+        residual = None
+        for part in reversed(self._parts):
+            parts.append(-part)
+            if part is self._residual:
+                residual = parts[-1]
+        ret = NumericRandomVariable._fromParts(sorted(parts, key=lambda p: p._min))
+        ret._residual = residual
+        ret._cdfError = self._cdfError
+        if self._focus is not None:
+            ret._focus = [(-t, w) for (t, w) in self._focus]
+        return ret
+
+    def __sub__(self, other):
+        if not isinstance(other, NumericRandomVariable):
+            return NotImplemented
+
+        return self + (-other)
+
     def __rmul__(self, other):
         if not isinstance(other, int):
             raise NotImplementedError
@@ -68,13 +795,20 @@ class NumericRandomVariable:
 
     def __mul__(self, other):
         if isinstance(other, int):
-            if other <= 0:
+            if other == 0:
                 raise NotImplementedError
+            elif other < 0:
+                return -(self * -other)
             elif other == 1:
                 return self
+            elif self.cltThreshold is not None and other >= self.cltThreshold:
+                return self._normalApproximation(other)
             else:
-                res = self + self * (other - 1)
-                print("mul", other, len(res._parts))
+                # doubling needs only O(log(other)) additions
+                half = self * (other // 2)
+                res = half + half
+                if other % 2 == 1:
+                    res = res + self
                 return res
         elif not isinstance(other, NumericRandomVariable):
             raise NotImplemented
@@ -83,7 +817,123 @@ class NumericRandomVariable:
         for part1 in self._parts:
             for part2 in other._parts:
                 parts.append(part1 * part2)
-        return NumericRandomVariable(_parts=parts)
+        ret = NumericRandomVariable(_parts=parts)
+        # P(X * Y <= s) is an average of P(X <= s / y) or P(X >= s / y), so the errors add up
+        ret._cdfError = min(self._cdfError + other._cdfError, 1.)
+        return ret
+
+    def _normalApproximation(self, n: int) -> "NumericRandomVariable":
+        """
+        Approximates X * n by a normal distribution, discretized into goalPartCount parts.
+        The Berry-Esseen bound on the approximation error is added to the cdf bounds.
+        """
+        mean = self.mean()
+        variance = max(self.square() - mean**2, 0.)
+        (min_value, max_value) = self._minmax()
+        if variance == 0:
+            return NumericRandomVariable._fromParts([numeric_part._Part(0., n * mean, (n * mean)**2, n * mean, n * mean)])
+
+        # E|X - mean|^3 <= sum of p * max distance to the mean * E[(X - mean)^2] over the parts
+        third = 0.
+        for part in self._parts:
+            distance = max(abs(part._min - mean), abs(part._max - mean))
+            third += exp(part._logp) * distance * max(part._square - 2 * mean * part._mean + mean**2, 0.)
+
+        sd = (n * variance)**0.5
+        # Berry-Esseen constant by Shevtsova (2011)
+        error = 0.4748 * third / (variance**1.5 * n**0.5)
+
+        # the normal distribution is truncated to the possible values [n * min, n * max]
+        # which changes the cdf at most by the probability of the tails
+        lower_z = (n * min_value - n * mean) / sd
+        upper_z = (n * max_value - n * mean) / sd
+        error += norm.cdf(lower_z) + norm.sf(upper_z)
+
+        count = _goalPartCount(NumericRandomVariable.goalPartCount)
+        levels = np.linspace(norm.cdf(lower_z), norm.cdf(upper_z), count + 1)
+        edges = norm.ppf(levels)
+        edges[0] = lower_z
+        edges[-1] = upper_z
+        (part_mean, part_variance) = truncnorm.stats(edges[:-1], edges[1:], moments="mv")
+        min_values = n * mean + sd * edges[:-1]
+        max_values = n * mean + sd * edges[1:]
+        means = np.clip(n * mean + sd * part_mean, min_values, max_values)
+        squares = np.maximum(means**2 + n * variance * part_variance, means**2)
+        squares = np.minimum(squares, means**2 + (max_values - means) * (means - min_values))
+
+        logp = -log(count)
+        ret = NumericRandomVariable._fromParts([
+            numeric_part._Part._clamped(logp, *args)
+            for args in zip(means.tolist(), squares.tolist(), min_values.tolist(), max_values.tolist())
+        ])
+        ret._cdfError = min(error + n * self._cdfError, 1.)
+        return ret
+
+    def log(self) -> "NumericRandomVariable":
+        """
+        returns log(X) for a positive random variable X, e.g. to compute products of many positive variables
+        as exp(sum of the logs) with the fast addition, see apply
+        """
+        if self._minmax()[0] <= 0:
+            raise Exception("log is only defined for positive random variables")
+        return self.apply(np.log, derivative=np.reciprocal, second_derivative=lambda x: -1 / x**2)
+
+    def exp(self) -> "NumericRandomVariable":
+        """
+        returns exp(X)
+        """
+        return self.apply(np.exp, derivative=np.exp, second_derivative=np.exp)
+
+    def apply(
+            self,
+            f,
+            monotone: Literal["increasing", "decreasing", "piecewise"] = "increasing",
+            breakpoints: List[float] = [],
+            derivative=None,
+            second_derivative=None) -> "NumericRandomVariable":
+        """
+        returns f(X) by mapping all parts at once, e.g. for caps, floors or piecewise linear fees.
+        f has to be increasing or decreasing or, for monotone="piecewise", continuous and monotone
+        between the given breakpoints. The range of each part is mapped exactly.
+        The mean and square of a part with variance are only bounded by the derivatives of f,
+        which also have to be monotone between the breakpoints, see numeric_part._mapArrays.
+        The cdf error grows by the resulting distance to the true cdf, which is small for parts
+        on which f is almost linear. Without derivatives it grows by up to the largest probability of parts
+        with variance overlapping any value, e.g. by 1 / parts for variables from from_continuous.
+        The cdf and quantil bounds of the result itself are also transferred from X through f,
+        so they stay tight e.g. for products of many positive variables computed as (X.log() * n).exp().
+        numpy ufuncs are applied to whole arrays, other functions are called for each value.
+        """
+        (f, derivative, second_derivative) = [
+            g if g is None or isinstance(g, np.ufunc) else np.vectorize(g, otypes=[float])
+            for g in (f, derivative, second_derivative)
+        ]
+
+        (p, mean, square, min_value, max_value) = self._index()[5]
+        (*columns, weights) = numeric_part._mapArrays(
+            f, mean, square, min_value, max_value, monotone, breakpoints, derivative, second_derivative)
+        if not all(np.all(np.isfinite(c)) for c in columns):
+            raise Exception("the mapped values need to be finite")
+
+        parts = []
+        residual = None
+        for (part, args) in zip(self._parts, zip(*(c.tolist() for c in columns))):
+            parts.append(numeric_part._Part._clamped(part._logp, *args))
+            if part is self._residual:
+                residual = parts[-1]
+        if monotone == "decreasing":
+            # as for the negation, this is (almost) sorted by min afterwards
+            parts.reverse()
+        # an increasing function keeps the order by min
+        if monotone != "increasing":
+            parts.sort(key=lambda p: p._min)
+        ret = NumericRandomVariable._fromParts(parts)
+        ret._residual = residual
+        ret._source = (self, f, monotone, breakpoints)
+        (_, _, new_min, new_max) = columns
+        error = numeric_part._maxOverlapArrays(p * weights, new_min, new_max)
+        ret._cdfError = min(self._cdfError + error, 1.)
+        return ret
 
     def _minmax(self) -> tuple[float, float]:
         min_value = self._parts[0]._min
@@ -105,39 +955,41 @@ class NumericRandomVariable:
             else:
                 upper_parts.append(part)
 
-        return (NumericRandomVariable(_parts=lower_parts), NumericRandomVariable(_parts=upper_parts))
+        (lower, upper) = (NumericRandomVariable(_parts=lower_parts), NumericRandomVariable(_parts=upper_parts))
+        # the error can not be attributed to one side
+        lower._cdfError = upper._cdfError = self._cdfError
+        return (lower, upper)
 
     def pscale(self, pfactor: float) -> "NumericRandomVariable":
         logpfactor = log(pfactor)
         scaled_parts = []
         for part in self._parts:
-            part._logp += logpfactor
-            scaled_parts.append(part)
-        return NumericRandomVariable(_parts=scaled_parts)
+            # parts are shared between random variables, so they must not be modified
+            scaled_parts.append(numeric_part._Part(
+                part._logp + logpfactor, part._mean, part._square, part._min, part._max))
+        ret = NumericRandomVariable(_parts=scaled_parts)
+        ret._cdfError = self._cdfError * pfactor
+        return ret
 
     def concat(self, other: "NumericRandomVariable") -> "NumericRandomVariable":
         """
         Concatenates two random variables, i.e. adds the parts of the other random variable to this one
         """
         parts = self._parts + other._parts
-        return NumericRandomVariable(_parts=parts)
+        ret = NumericRandomVariable(_parts=parts)
+        ret._cdfError = self._cdfError + other._cdfError
+        return ret
 
     def plot_outcomes(
             self,
             xscale: Literal["linear", "log"] = "linear",
             yscale: Literal["linear", "log"] = "linear",
             ignore_tails_p: Union[Fraction, int, float] = 0):
-        outcomes = sorted(self.outcomes(), key=lambda o: o["value"])
-        sum_p = 0.
-        x = []
-        y = []
-        for o in outcomes:
-            sum_p = o["p"]
-            if sum_p <= ignore_tails_p or sum_p >= 1 - ignore_tails_p:
-                continue
-
-            x.append(o["value"])
-            y.append(o["p"])
+        (values, p) = self.outcomes_array()
+        sum_p = np.cumsum(p)
+        visible = (sum_p > ignore_tails_p) & (sum_p - p < 1 - ignore_tails_p)
+        x = values[visible]
+        y = p[visible]
 
         fig, ax = plt.subplots()
         ax.set_xscale(xscale)
@@ -169,34 +1021,21 @@ class NumericRandomVariable:
             min_value = lower_value
         delta = (max_value - min_value) / steps
         delta_float = float(delta)
-        last_value = min_value
-        last_lower = 0.
-        last_upper = 0.
-        while last_value < max_value:
-            current_value = last_value + delta
-            (current_lower, current_upper) = self.cdf(current_value)
-
-            xmin = float(last_value)
+        points = [min_value + delta * (i + 1) for i in range(steps)]
+        (cumulative_lower, cumulative_upper) = self.cdf_table(points)
+        if cumulative:
+            (lower, upper) = (cumulative_lower, cumulative_upper)
+        else:
+            # the first bin also contains everything below min_value
+            (lower, upper) = NumericRandomVariable._binBounds(
+                np.concatenate(([0.], cumulative_lower)), np.concatenate(([0.], cumulative_upper)))
+
+        for (i, (l, u)) in enumerate(zip(lower, upper)):
+            xmin = float(min_value + delta * i)
             xmax = xmin + delta_float
-            value = float(current_lower / 2 + current_upper / 2) if cumulative else \
-                float(current_lower / 2 + current_upper / 2 - last_lower / 2 - last_upper / 2)
-            ax.add_patch(Rectangle((xmin, 0), delta_float, value))
-            ax.hlines(
-                float(current_lower) if cumulative else float(current_lower - last_upper),
-                xmin,
-                xmax,
-                color="red"
-            )
-            ax.hlines(
-                float(current_upper) if cumulative else max(0, float(current_upper - last_lower)),
-                xmin,
-                xmax,
-                color="black"
-            )
-
-            last_value = current_value
-            last_lower = current_lower
-            last_upper = current_upper
+            ax.add_patch(Rectangle((xmin, 0), delta_float, float(l / 2 + u / 2)))
+            ax.hlines(float(l), xmin, xmax, color="red")
+            ax.hlines(float(u), xmin, xmax, color="black")
 
         ax.margins(0.01)
         ax.autoscale()
@@ -222,22 +1061,20 @@ class NumericRandomVariable:
         delta = (max_value - min_value) / steps
         delta_float = float(delta)
 
-        last_value = min_value
+        points = [min_value + delta * (i + 1) for i in range(steps)]
+        (lower, upper) = self.cdf_table(points)
         x = []
         y = []
         lx = []
         ly = []
         ux = []
         uy = []
-        while last_value < max_value:
-            current_value = last_value + delta
-            (current_lower, current_upper) = self.cdf(current_value)
-
+        for (current_value, current_lower, current_upper) in zip(points, lower, upper):
             value_float = float(current_value)
             current_p = float(current_lower / 2 + current_upper / 2)
             x.append(value_float)
             y.append(current_p)
-            
+
             lower_float = float(current_lower)
             lx.append(lower_float)
             ly.append(value_float)
@@ -249,20 +1086,6 @@ class NumericRandomVariable:
             uy.append(value_float - delta_float)
             ux.append(upper_float)
             uy.append(value_float)
-            #ax.vlines(
-            #    float(current_lower),
-            #    value_float,
-            #    value_float + delta_float,
-            #    color="red"
-            #)
-            #ax.vlines(
-            #    float(current_upper),
-            #    value_float - delta_float,
-            #    value_float,
-            #    color="black"
-            #)
-
-            last_value = current_value
 
         ax.margins(0.01)
         ax.autoscale()
@@ -281,15 +1104,79 @@ class NumericRandomVariable:
 
         return fig, ax
 
+    @staticmethod
+    def _pruneAndSimplifyParts(
+            parts: List[numeric_part._Part],
+            residual_parts: List[numeric_part._Part] = [],
+            focus: Union[List[tuple], None] = None) -> tuple[List[numeric_part._Part], Union[numeric_part._Part, None]]:
+        """
+        Folds the parts with a probability below pruneThreshold together with residual_parts
+        into one residual part and simplifies the remaining parts.
+        The residual part keeps its probability, moments and [min, max] range, so the cdf bounds stay valid.
+        Returns the parts (including the residual part) sorted by min and the residual part.
+        """
+        residual_parts = residual_parts[:]
+        if NumericRandomVariable.pruneThreshold > 0:
+            # points only fall below the threshold if they are still small after coalescing
+            parts = NumericRandomVariable._coalescePoints(parts)
+            logthreshold = log(NumericRandomVariable.pruneThreshold)
+            kept_parts = []
+            for part in parts:
+                if part._logp < logthreshold:
+                    residual_parts.append(part)
+                else:
+                    kept_parts.append(part)
+            parts = kept_parts
+
+        parts = NumericRandomVariable._simplifyParts(parts, focus)
+        if len(residual_parts) == 0:
+            return (parts, None)
+
+        residual = reduce(numeric_part._Part.merge, residual_parts)
+        return (sorted(parts + [residual], key=lambda p: p._min), residual)
+
+    @staticmethod
+    def _coalescePoints(parts: List[numeric_part._Part]) -> List[numeric_part._Part]:
+        """
+        adds up the probabilities of point parts (min == max) with the same value,
+        the coalesced part takes the position of the first one, so the order by min is kept
+        """
+        ret = []
+        points = {}
+        for p in parts:
+            if p._min != p._max:
+                ret.append(p)
+            elif p._min in points:
+                i = points[p._min]
+                ret[i] = numeric_part._Part(logaddexp(ret[i]._logp, p._logp), ret[i]._mean, ret[i]._square, ret[i]._min, ret[i]._max)
+            else:
+                points[p._min] = len(ret)
+                ret.append(p)
+        return ret
+
+    @staticmethod
+    def _focusPenalty(value: float, focus: List[tuple], merged) -> float:
+        """
+        penalizes the heuristic value of a merge straddling focus thresholds by their weights,
+        scaled with the absolute value, so the penalty also increases negative values
+        """
+        weight = sum(w for (t, w) in focus if merged._min <= t < merged._max)
+        return value + weight * abs(value)
+
     @ staticmethod
-    def _simplifyParts(parts: List[numeric_part._Part]) -> List[numeric_part._Part]:
+    def _simplifyParts(parts: List[numeric_part._Part], focus: Union[List[tuple], None] = None) -> List[numeric_part._Part]:
         def heuristic(part1: numeric_part._Part, part2: numeric_part._Part, merged: numeric_part._Part):
             value = merged.cdf_uncertainty(exact_upper=False)
             value -= exp(part1._logp - mergedPart._logp) * part1.cdf_uncertainty()
             value -= exp(part2._logp - mergedPart._logp) * part2.cdf_uncertainty()
-            return exp(merged._logp) * value
+            value = exp(merged._logp) * value
+            if focus is not None:
+                value = NumericRandomVariable._focusPenalty(value, focus, merged)
+            return value
 
-        goalPartCount = 200
+        # identical points are coalesced before any lossy merge
+        parts = NumericRandomVariable._coalescePoints(parts)
+        goalPartCount = _goalPartCount(NumericRandomVariable.goalPartCount)
         if len(parts) > goalPartCount:
             sortedParts = sorted(parts, key=lambda part: part._mean)
             mergeBounds = []
@@ -325,7 +1212,7 @@ class NumericRandomVariable:
             simplifiedParts.append(currentPart)
 
             if len(simplifiedParts) > 1.1 * goalPartCount:
-                return NumericRandomVariable._simplifyParts(simplifiedParts)
+                return NumericRandomVariable._simplifyParts(simplifiedParts, focus)
 
         else:
             simplifiedParts = parts[:]
@@ -338,7 +1225,4 @@ class FairDie(NumericRandomVariable):
         """
         Generates a fair die with n sides
         """
-        p = 1./ n
-        outcomes = [numeric_part.NumericOutcome(p=p, value=i) for i in range(1, n + 1)]
-
-        super().__init__(outcomes)
+        self._parts = NumericRandomVariable._partsFromArrays(np.arange(1, n + 1), np.full(n, 1. / n))
@@ -6,6 +6,10 @@ Outcome = TypedDict("Outcome", {"p": Union[Fraction, int], "value": Union[Fracti
 
 
 class _Part():
+    # denominator limits used when merging parts, larger values are more accurate but slower
+    maxProbabilityDenominator = 1000_000_000_000_000_000_000_000_000
+    maxMomentDenominator = 1000_000
+
     def __init__(
             self, p: Union[Fraction, int],
             mean: Union[Fraction, int],
@@ -31,6 +35,20 @@ class _Part():
         assert(self._square >= self._mean**2)
         assert(self._square <= self._mean**2 + (self._mean - self._min) * (self._max - self._mean))
 
+    @staticmethod
+    def _unchecked(p: Fraction, mean: Fraction, square: Fraction, min: Fraction, max: Fraction) -> '_Part':
+        """
+        creates a part from Fractions which are consistent by construction (e.g. sums of parts)
+        without converting and checking them again
+        """
+        part = _Part.__new__(_Part)
+        part._p = p
+        part._mean = mean
+        part._square = square
+        part._min = min
+        part._max = max
+        return part
+
 #    def get_partial_expected(self):
 #        return self._mean * self._p
 #
@@ -45,11 +63,14 @@ class _Part():
             return (Fraction(0), Fraction(0))
 
         d = self._square - self._mean**2
-        if d == 0 or value >= self._max:
-            # d == 0 is a corner case where there is no variance
-            # should imply _min = _mean = _max
+        if value >= self._max:
             return (self._p, self._p)
 
+        if d == 0:
+            # d == 0 is a corner case where there is no variance
+            # all probability is at _mean, even if _min < _mean
+            return (self._p, self._p) if value >= self._mean else (Fraction(0), Fraction(0))
+
         # as d > 0, _max - _mean > 0 and _mean - _min > 0
         dmaxmean = self._max - self._mean
         bound1 = self._mean - d / dmaxmean
@@ -133,6 +154,9 @@ class _Part():
 
         return _Part(p, mean, square, min, max)
 
+    def __neg__(self):
+        return _Part(self._p, -self._mean, self._square, -self._max, -self._min)
+
     def __mul__(self, other):
         if not isinstance(other, _Part):
             return NotImplemented
@@ -198,9 +222,9 @@ class _Part():
         # denominator limiting is required for a fast enough computation
         # however, the big denominator should result in a very small derivation
         # make sure that the rounding does not make problems with the numbers 
-        new_p = p if log(p.numerator, 10) - log(p.denominator, 10) < -3*7 else p.limit_denominator(max_denominator=1000_000_000_000_000_000_000_000_000)
-        new_ex = (ex / p).limit_denominator(max_denominator=1000_000)
-        new_exx = (exx / p).limit_denominator(max_denominator=1000_000)
+        new_p = p if log(p.numerator, 10) - log(p.denominator, 10) < -3*7 else p.limit_denominator(max_denominator=_Part.maxProbabilityDenominator)
+        new_ex = (ex / p).limit_denominator(max_denominator=_Part.maxMomentDenominator)
+        new_exx = (exx / p).limit_denominator(max_denominator=_Part.maxMomentDenominator)
         
         new_ex = max(new_ex, min_value)
         new_ex = min(new_ex, max_value)
@@ -1,12 +1,38 @@
+import heapq
+import bisect
 import itertools
+import threading
 from fractions import Fraction
+from math import lcm
 from typing import List, Literal, Union
 from . import part
 import matplotlib.pyplot as plt
 from matplotlib.patches import Rectangle
-import time
+import numpy as np
+from .sampling import _aliasTable, _sampleAlias
+from .continuous import _continuousBuckets
+from .anytime import _goalPartCount
+from .tails import _tailExpectationBounds, _shortfallAtoms, _expectedShortfall
+
+def _bits(values) -> int:
+    return max((abs(int(v)).bit_length() for v in values), default=0)
+
 
 class RandomVariable:
+    goalPartCount = 800
+    # above this bit length of the shared square denominator, parts are added as Fractions one by one
+    maxScaledDenominatorBits = 3072
+    # additional error on the cdf bounds, e.g. from cutting off tails
+    _cdfError = Fraction(0)
+    # lazily built caches, the parts themselves are never modified after construction
+    _sampler = None
+    _scaled = None
+    _indexCache = None
+    _tailCache = None
+    # list of (threshold, weight), merges of parts straddling a threshold are penalized by its weight
+    _focus = None
+    _cacheLock = threading.RLock()
+
     def __init__(self, outcomes: List[part.Outcome] = [], _parts: List[part._Part] = []):
         parts = []
         for p in _parts:
@@ -24,11 +50,218 @@ class RandomVariable:
 
         self._parts = RandomVariable._simplifyParts(parts)
 
+    @staticmethod
+    def from_arrays(values, probs, denominators=None) -> "RandomVariable":
+        """
+        Generates a random variable from an array of values and an array of probabilities.
+        If denominators is given, probs are interpreted as integer numerators, i.e. the
+        probability of values[i] is probs[i] / denominators[i].
+        Equal values are aggregated, so values do not need to be unique.
+        """
+        return RandomVariable._fromParts(RandomVariable._partsFromArrays(values, probs, denominators))
+
+    @staticmethod
+    def from_continuous(dist, parts: Union[int, None] = None, tail_mass: float = 0.) -> "RandomVariable":
+        """
+        Discretizes a continuous scipy.stats distribution into parts of equal probability
+        with rational bounds, see NumericRandomVariable.from_continuous.
+        """
+        (levels, edges, means, squares) = _continuousBuckets(dist, parts or RandomVariable.goalPartCount, tail_mass)
+        p = Fraction(1, len(means))
+        parts = []
+        for (mean, square, min_value, max_value) in zip(means.tolist(), squares.tolist(), edges[:-1].tolist(), edges[1:].tolist()):
+            min_value = Fraction(min_value)
+            max_value = Fraction(max_value)
+            mean = min(max(Fraction(mean).limit_denominator(1000_000), min_value), max_value)
+            square = max(Fraction(square).limit_denominator(1000_000), mean**2)
+            square = min(square, mean**2 + (max_value - mean) * (mean - min_value))
+            parts.append(part._Part(p, mean, square, min_value, max_value))
+
+        ret = RandomVariable._fromParts(parts)
+        ret._cdfError = Fraction(tail_mass)
+        return ret
+
+    @staticmethod
+    def _fromParts(parts: List[part._Part]) -> "RandomVariable":
+        """
+        creates a random variable from parts which are already simplified and sorted by min
+        """
+        var = RandomVariable.__new__(RandomVariable)
+        var._parts = parts
+        return var
+
+    @staticmethod
+    def _integerRatios(array):
+        """
+        returns integer numerators as an object array and their common denominator,
+        which represent the exact values of the array
+        """
+        numeric = np.asarray(array)
+        if numeric.dtype.kind in "iub":
+            return (numeric.astype(object), 1)
+        if numeric.dtype.kind != "f":
+            numeric = np.asarray(array, dtype=object)
+        ratios = [
+            (x if isinstance(x, (int, float, Fraction)) else Fraction(x)).as_integer_ratio()
+            for x in numeric.tolist()
+        ]
+        numerators = np.array([n for (n, _) in ratios], dtype=object)
+        denominators = np.array([d for (_, d) in ratios], dtype=object)
+        denominator = lcm(*set(denominators.tolist()))
+        return (numerators * (denominator // denominators), denominator)
+
+    @staticmethod
+    def _partsFromArrays(values, probs, denominators=None) -> List[part._Part]:
+        # values and probs are kept as integer numerators over common denominators,
+        # so the aggregation and the buckets only need integer arithmetic
+        # and fractions are only created for the resulting parts
+        (values, valueDenominator) = RandomVariable._integerRatios(values)
+        if denominators is None:
+            (probs, denominator) = RandomVariable._integerRatios(probs)
+        else:
+            numerators = np.asarray(probs).astype(object)
+            denominators = np.asarray(denominators).astype(object)
+            denominator = lcm(*set(denominators.tolist()))
+            probs = numerators * (denominator // denominators)
+
+        if len(values) != len(probs):
+            raise Exception("values and probs need to have the same length")
+        if len(values) == 0:
+            return []
+
+        order = np.argsort(values, kind="stable")
+        values = values[order]
+        probs = probs[order]
+        starts = np.flatnonzero(np.concatenate(([True], values[1:] != values[:-1])))
+        values = values[starts]
+        probs = np.add.reduceat(probs, starts)
+        keep = probs != 0
+        values = values[keep]
+        probs = probs[keep]
+
+        goalPartCount = RandomVariable.goalPartCount
+        if len(values) <= goalPartCount:
+            ret = []
+            for (p, v) in zip(probs.tolist(), values.tolist()):
+                v = Fraction(v, valueDenominator)
+                ret.append(part._Part(Fraction(p, denominator), v, v**2, v, v))
+            return ret
+
+        # group the sorted values into buckets of roughly equal probability
+        # each bucket gets the exact moments, so the cdf bounds stay valid
+        cumulative = np.cumsum(probs) - probs
+        group = (cumulative * goalPartCount) // (cumulative[-1] + probs[-1])
+        starts = np.flatnonzero(np.concatenate(([True], group[1:] != group[:-1])))
+        ends = np.concatenate((starts[1:], [len(values)])) - 1
+        p = np.add.reduceat(probs, starts)
+        ex = np.add.reduceat(probs * values, starts)
+        exx = np.add.reduceat(probs * values * values, starts)
+        return [
+            part._Part(
+                Fraction(pi, denominator),
+                Fraction(exi, pi * valueDenominator),
+                Fraction(exxi, pi * valueDenominator**2),
+                Fraction(min_value, valueDenominator),
+                Fraction(max_value, valueDenominator))
+            for (pi, exi, exxi, min_value, max_value)
+            in zip(p.tolist(), ex.tolist(), exx.tolist(), values[starts].tolist(), values[ends].tolist())
+        ]
+
     def outcomes(self):
-        outcomes: List[part.Outcome] = list(
-            itertools.chain(*[part.outcomes() for part in self._parts]))
+        outcomes: List[part.Outcome] = list(self.iter_outcomes())
         return outcomes
 
+    def iter_outcomes(self):
+        """
+        yields the outcomes part by part without building the full list
+        """
+        return itertools.chain.from_iterable(part.outcomes() for part in self._parts)
+
+    def outcomes_array(self):
+        """
+        returns the outcomes as arrays (values, numerators, denominators) sorted by value,
+        where the probability of values[i] is numerators[i] / denominators[i].
+        Equal values of different parts are aggregated.
+        """
+        p = np.array([part._p for part in self._parts], dtype=object)
+        mean = np.array([part._mean for part in self._parts], dtype=object)
+        square = np.array([part._square for part in self._parts], dtype=object)
+        min_values = np.array([part._min for part in self._parts], dtype=object)
+        max_values = np.array([part._max for part in self._parts], dtype=object)
+
+        # same three point decomposition as in part._Part.outcomes
+        spread = (min_values != mean) & (max_values != mean)
+        p_min = np.zeros(len(p), dtype=object)
+        p_max = np.zeros(len(p), dtype=object)
+        diff = (square[spread] - mean[spread]**2) / (max_values[spread] - min_values[spread]) * p[spread]
+        p_min[spread] = diff / (mean[spread] - min_values[spread])
+        p_max[spread] = diff / (max_values[spread] - mean[spread])
+        p_mean = p - p_min - p_max
+
+        values = np.concatenate((min_values, mean, max_values))
+        probs = np.concatenate((p_min, p_mean, p_max))
+        keep = probs != 0
+        values = values[keep]
+        probs = probs[keep]
+        order = np.argsort(values, kind="stable")
+        values = values[order]
+        probs = probs[order]
+        if len(values) > 0:
+            starts = np.flatnonzero(np.concatenate(([True], values[1:] != values[:-1])))
+            values = values[starts]
+            probs = np.add.reduceat(probs, starts)
+
+        numerators = np.array([Fraction(p).numerator for p in probs], dtype=object)
+        denominators = np.array([Fraction(p).denominator for p in probs], dtype=object)
+        return (values, numerators, denominators)
+
+    def sample(self, size=None, rng=None):
+        """
+        draws independent samples of the random variable using an alias table
+        over the outcomes, which is built on the first call and then reused.
+        rng can be anything accepted by numpy.random.default_rng.
+        """
+        def build():
+            (values, numerators, denominators) = self.outcomes_array()
+            probs = (numerators / denominators).astype(float)
+            (accept, alias) = _aliasTable(probs)
+            return (values, accept, alias)
+
+        (values, accept, alias) = self._cached("_sampler", build)
+        return values[_sampleAlias(accept, alias, size, rng)]
+
+    def _cached(self, name: str, build):
+        """
+        returns the lazily built cache attribute name and builds it with build() on the first call.
+        The parts of a random variable are never modified after construction,
+        so the caches can be shared between threads once they are built.
+        """
+        value = getattr(self, name)
+        if value is None:
+            with RandomVariable._cacheLock:
+                value = getattr(self, name)
+                if value is None:
+                    value = build()
+                    setattr(self, name, value)
+        return value
+
+    def _index(self):
+        """
+        returns (mins, cumulative p by min, sorted maxs, cumulative p by max, order of the parts by max)
+        for answering cdf and quantil queries with a binary search
+        """
+        def build():
+            parts = self._parts
+            by_max = sorted(range(len(parts)), key=lambda i: parts[i]._max)
+            return (
+                [part._min for part in parts],
+                list(itertools.accumulate(part._p for part in parts)),
+                [parts[i]._max for i in by_max],
+                list(itertools.accumulate(parts[i]._p for i in by_max)),
+                by_max)
+
+        return self._cached("_indexCache", build)
+
     def mean(self) -> Fraction:
         mean = Fraction(0)
         for part in self._parts:
@@ -55,8 +288,93 @@ class RandomVariable:
             lower += l
             upper += u
 
+        if self._cdfError > 0:
+            return (max(lower - self._cdfError, Fraction(0)), min(upper + self._cdfError, Fraction(1)))
+        return (lower, upper)
+
+    def _cdfSweep(self, values, strict: bool = False):
+        """
+        yields the cdf bounds for ascending values in a single sweep over the parts.
+        Parts which are completely below the current value are only summed up once,
+        so only the parts containing the current value have to be evaluated.
+        If strict, the bounds are on the left limits P(X < value) instead,
+        where the lower bounds only count the parts below the value.
+        """
+        parts = self._parts
+        by_max = self._index()[4]
+        active = {}
+        done = Fraction(0)
+        i_min = 0
+        i_max = 0
+        for value in values:
+            while i_min < len(parts) and (parts[i_min]._min < value or not strict and parts[i_min]._min == value):
+                active[i_min] = parts[i_min]
+                i_min += 1
+            while i_max < len(parts) and (
+                    parts[by_max[i_max]]._max < value or not strict and parts[by_max[i_max]]._max == value):
+                done += active.pop(by_max[i_max])._p
+                i_max += 1
+
+            lower = done
+            upper = done
+            for part in active.values():
+                (l, u) = part.partial_cdf(value)
+                if not strict:
+                    lower += l
+                upper += u
+            yield (max(lower - self._cdfError, Fraction(0)), min(upper + self._cdfError, Fraction(1)))
+
+    def cdf_table(self, points) -> tuple[np.ndarray, np.ndarray]:
+        """
+        returns object arrays with lower and upper bounds on the cumulative distribution function at all points,
+        computed in a single sweep over the parts
+        """
+        points = list(points)
+        order = sorted(range(len(points)), key=points.__getitem__)
+        lower = np.empty(len(points), dtype=object)
+        upper = np.empty(len(points), dtype=object)
+        for (i, (l, u)) in zip(order, self._cdfSweep(points[i] for i in order)):
+            lower[i] = l
+            upper[i] = u
         return (lower, upper)
 
+    def histogram_bounds(self, bins) -> tuple[np.ndarray, np.ndarray]:
+        """
+        returns arrays with lower and upper bounds on the probability of each bin (bins[i], bins[i + 1]],
+        where bins are the ascending bin edges
+        """
+        return RandomVariable._binBounds(*self.cdf_table(bins))
+
+    @staticmethod
+    def _binBounds(lower: np.ndarray, upper: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # bounds on the differences of consecutive cdf values
+        return (np.maximum(lower[1:] - upper[:-1], Fraction(0)), np.minimum(upper[1:] - lower[:-1], Fraction(1)))
+
+    def prob_less(self, other: "RandomVariable") -> tuple[Fraction, Fraction]:
+        """
+        returns lower and upper bounds on P(self < other) for independent random variables
+        """
+        # P(self < other) <= sum over the parts of other of p * P(self < part max),
+        # which is exact for point parts, and P(other <= self) = 1 - P(self < other)
+        # is bounded in the same way with P(other <= part max) over the parts of self
+        return (1 - other._probLessEqualUpper(self), self._probLessEqualUpper(other, strict=True))
+
+    def prob_greater(self, other: "RandomVariable") -> tuple[Fraction, Fraction]:
+        """
+        returns lower and upper bounds on P(self > other) for independent random variables
+        """
+        return other.prob_less(self)
+
+    def _probLessEqualUpper(self, other: "RandomVariable", strict: bool = False) -> Fraction:
+        """
+        returns an upper bound on P(self <= other), or on P(self < other) if strict
+        """
+        other_parts = sorted(other._parts, key=lambda part: part._max)
+        ret = Fraction(0)
+        for (other_part, (_, upper)) in zip(other_parts, self._cdfSweep((part._max for part in other_parts), strict)):
+            ret += other_part._p * upper
+        return min(ret, Fraction(1))
+
     def quantil(self, q: Fraction):
         # TODO: use lower and upper bound, this is not really correct
         sum = Fraction(0, 1)
@@ -67,16 +385,344 @@ class RandomVariable:
 
         return self._minmax()[1]
 
+    def quantil_bounds(self, q: Fraction) -> tuple[Fraction, Fraction]:
+        """
+        returns lower and upper bounds on the q quantil of the random variable
+        """
+        (mins, cumulative_min, maxs, cumulative_max, _) = self._index()
+        last = len(mins) - 1
+        # below the min of the first part up to which the probability reaches q the cdf is smaller than q,
+        # at the max of the first part (ordered by max) up to which the probability reaches q it is at least q
+        lower = mins[min(bisect.bisect_left(cumulative_min, q - self._cdfError), last)]
+        upper = maxs[min(bisect.bisect_left(cumulative_max, q + self._cdfError), last)]
+        return (lower, upper)
+
+    def query_parallel(self, queries: List[tuple[str, Fraction]], executor, batch_size: int = 1000) -> list:
+        """
+        answers a list of queries like ("cdf", value) or ("quantil_bounds", q) in batches on the executor,
+        e.g. a concurrent.futures.ThreadPoolExecutor, and returns the results in the order of the queries
+        """
+        self._index()
+        futures = [
+            executor.submit(self._queryBatch, queries[start:start + batch_size])
+            for start in range(0, len(queries), batch_size)
+        ]
+        return [result for future in futures for result in future.result()]
+
+    def _queryBatch(self, queries: List[tuple[str, Fraction]]) -> list:
+        results = [None] * len(queries)
+        cdf_queries = sorted((value, i) for (i, (name, value)) in enumerate(queries) if name == "cdf")
+        for ((_, i), bounds) in zip(cdf_queries, self._cdfSweep(value for (value, _) in cdf_queries)):
+            results[i] = bounds
+        for (i, (name, value)) in enumerate(queries):
+            if name != "cdf":
+                results[i] = getattr(self, name)(value)
+        return results
+
+    def _tailIndex(self):
+        """
+        returns (suffix sums of p and p * mean of the parts ordered by min, running maximum of their maxs,
+        atoms of the part means, atoms of the two point distributions on min and max) for the tail queries
+        """
+        def build():
+            parts = self._parts
+            suffix_p = list(itertools.accumulate(part._p for part in reversed(parts)))[::-1] + [Fraction(0)]
+            suffix_pmean = list(itertools.accumulate(part._p * part._mean for part in reversed(parts)))[::-1] + [Fraction(0)]
+            prefix_max = list(itertools.accumulate((part._max for part in parts), max))
+            weights = [
+                (part._mean - part._min) / (part._max - part._min) if part._max > part._min else Fraction(0)
+                for part in parts
+            ]
+            means = _shortfallAtoms([part._mean for part in parts], [part._p for part in parts])
+            spread = _shortfallAtoms(
+                [part._min for part in parts] + [part._max for part in parts],
+                [part._p * (1 - w) for (part, w) in zip(parts, weights)] + [part._p * w for (part, w) in zip(parts, weights)])
+            return (suffix_p, suffix_pmean, prefix_max, means, spread)
+
+        return self._cached("_tailCache", build)
+
+    def tail_expectation_bounds(self, t: Fraction) -> Union[tuple[Fraction, Fraction], None]:
+        """
+        returns lower and upper bounds on E[X | X > t] or None if X > t is impossible
+        """
+        mins = self._index()[0]
+        (suffix_p, suffix_pmean, prefix_max, _, _) = self._tailIndex()
+        # the parts from k on are completely above t, only the parts before k with max > t straddle t
+        k = bisect.bisect_right(mins, t)
+        straddling = []
+        j = k - 1
+        while j >= 0 and prefix_max[j] > t:
+            part = self._parts[j]
+            if part._max > t:
+                straddling.append((part._p, part._mean, part._min, part._max))
+            j -= 1
+        return _tailExpectationBounds(t, suffix_p[k], suffix_pmean[k], straddling)
+
+    def expected_shortfall_bounds(self, alpha: Fraction) -> tuple[Fraction, Fraction]:
+        """
+        returns lower and upper bounds on the expected shortfall, i.e. the mean of the largest 1 - alpha part
+        of the distribution. Putting the mass of each part at its mean gives the lower bound,
+        putting it at min and max (with the same mean) gives the upper bound.
+        Mass cut off by from_continuous is not taken into account.
+        """
+        (_, _, _, means, spread) = self._tailIndex()
+        return (_expectedShortfall(means, alpha), _expectedShortfall(spread, alpha))
+
+    def with_focus(self, focus: List[tuple]) -> "RandomVariable":
+        """
+        Returns the same random variable, whose sums are simplified with a focus on the given
+        list of (threshold, weight): merges of parts straddling a threshold are penalized by weight times the absolute value of their heuristic,
+        so the cdf bounds near the thresholds stay tight at the cost of the bounds elsewhere.
+        For a tail focus, give the threshold of the tail, e.g. a high quantil.
+        """
+        ret = RandomVariable._fromParts(self._parts)
+        ret._cdfError = self._cdfError
+        ret._focus = [(Fraction(t), w) for (t, w) in focus]
+        return ret
+
+    @staticmethod
+    def _combinedFocus(focus1, focus2):
+        if focus1 is None or focus2 is None:
+            return focus1 if focus2 is None else focus2
+        # sums of copies share their focus, which should not be counted twice
+        return focus1 + [f for f in focus2 if f not in focus1]
+
     def __add__(self, other):
-        start = time.time()
-        parts = []
-        for part1 in self._parts:
-            for part2 in other._parts:
-                parts.append(part1 + part2)
-        ret = RandomVariable(_parts=parts)
-        print("add %s" % (time.time() - start))
+        focus = RandomVariable._combinedFocus(self._focus, other._focus)
+        ret = RandomVariable._fromParts(RandomVariable._simplifyParts(self._addScaled(other), focus))
+        ret._cdfError = self._cdfError + other._cdfError
+        ret._focus = focus
+        return ret
+
+    def _scaledParts(self):
+        """
+        Returns the parts as integer numerators on shared denominators
+        (p_denominator, value_denominator, square_denominator, p, mean, square, min, max),
+        where mean, min and max share value_denominator.
+        The arrays are built once per random variable.
+        Returns None if the shared square denominator has more than maxScaledDenominatorBits bits.
+        """
+        def build():
+            parts = self._parts
+            p_denominator = lcm(*[part._p.denominator for part in parts])
+            value_denominator = lcm(*[
+                d for part in parts for d in (part._mean.denominator, part._min.denominator, part._max.denominator)])
+            square_denominator = lcm(value_denominator**2, *[part._square.denominator for part in parts])
+            if square_denominator.bit_length() > RandomVariable.maxScaledDenominatorBits:
+                # an empty tuple marks the cache as built
+                return ()
+
+            def scaled(values, denominator):
+                return np.array([v.numerator * (denominator // v.denominator) for v in values], dtype=object)
+
+            return (
+                p_denominator,
+                value_denominator,
+                square_denominator,
+                scaled([part._p for part in parts], p_denominator),
+                scaled([part._mean for part in parts], value_denominator),
+                scaled([part._square for part in parts], square_denominator),
+                scaled([part._min for part in parts], value_denominator),
+                scaled([part._max for part in parts], value_denominator))
+
+        return self._cached("_scaled", build) or None
+
+    def _addScaled(self, other: "RandomVariable") -> List[part._Part]:
+        """
+        Computes all pairwise sums of the parts with integer arithmetic on the shared denominators,
+        so that no gcd is needed until the Fractions of the resulting parts are created.
+        Merged parts have unrelated denominators, whose lcm can get so large that adding the Fractions
+        part by part is faster, which is done above maxScaledDenominatorBits.
+        """
+        scaled1 = self._scaledParts()
+        scaled2 = other._scaledParts()
+        if scaled1 is None or scaled2 is None or lcm(scaled1[2], scaled2[2]).bit_length() > RandomVariable.maxScaledDenominatorBits:
+            return sorted((part1 + part2 for part1 in self._parts for part2 in other._parts), key=lambda p: p._min)
+
+        (p_denominator1, value_denominator1, square_denominator1, p1, mean1, square1, min1, max1) = scaled1
+        (p_denominator2, value_denominator2, square_denominator2, p2, mean2, square2, min2, max2) = scaled2
+        value_denominator = lcm(value_denominator1, value_denominator2)
+        square_denominator = lcm(square_denominator1, square_denominator2, value_denominator**2)
+        factor1 = value_denominator // value_denominator1
+        factor2 = value_denominator // value_denominator2
+        square_factor1 = square_denominator // square_denominator1
+        square_factor2 = square_denominator // square_denominator2
+        mixed_factor = 2 * (square_denominator // (value_denominator1 * value_denominator2))
+
+        # use machine integers if no intermediate result can overflow
+        bits = max(
+            _bits(p1) + _bits(p2),
+            max(_bits(mean1) + _bits([factor1]), _bits(mean2) + _bits([factor2])) + 1,
+            max(_bits(min1) + _bits([factor1]), _bits(min2) + _bits([factor2])) + 1,
+            max(_bits(max1) + _bits([factor1]), _bits(max2) + _bits([factor2])) + 1,
+            max(
+                _bits(square1) + _bits([square_factor1]),
+                _bits(square2) + _bits([square_factor2]),
+                _bits(mean1) + _bits(mean2) + _bits([mixed_factor])) + 2)
+        dtype = np.int64 if bits < 63 else object
+
+        def outer_sum(values1, factor1, values2, factor2):
+            return np.add.outer(values1.astype(dtype) * factor1, values2.astype(dtype) * factor2).ravel()
+
+        min_values = outer_sum(min1, factor1, min2, factor2)
+        # sorting the integers is cheaper than sorting the parts by their Fractions later on
+        order = np.argsort(min_values, kind="stable")
+        min_values = min_values[order].tolist()
+        max_values = outer_sum(max1, factor1, max2, factor2)[order].tolist()
+        p = np.multiply.outer(p1.astype(dtype), p2.astype(dtype)).ravel()[order].tolist()
+        mean = outer_sum(mean1, factor1, mean2, factor2)[order].tolist()
+        square = (
+            np.add.outer(square1.astype(dtype) * square_factor1, square2.astype(dtype) * square_factor2)
+            + np.multiply.outer(mean1.astype(dtype), mean2.astype(dtype)) * mixed_factor).ravel()[order].tolist()
+
+        # point parts with the same value are added up exactly before any Fraction is created,
+        # keeping the position of the first one, so the rows stay sorted by min
+        rows = []
+        points = {}
+        for row in zip(p, mean, square, min_values, max_values):
+            if row[3] != row[4]:
+                rows.append(row)
+            elif row[3] in points:
+                i = points[row[3]]
+                rows[i] = (rows[i][0] + row[0],) + rows[i][1:]
+            else:
+                points[row[3]] = len(rows)
+                rows.append(row)
+
+        p_denominator = p_denominator1 * p_denominator2
+        return [
+            part._Part._unchecked(
+                Fraction(pi, p_denominator),
+                Fraction(mi, value_denominator),
+                Fraction(si, square_denominator),
+                Fraction(lo, value_denominator),
+                Fraction(hi, value_denominator))
+            for (pi, mi, si, lo, hi) in rows
+        ]
+
+    @staticmethod
+    def sum(variables) -> "RandomVariable":
+        """
+        Adds up the given random variables.
+        Always the two variables with the fewest parts are added first (like in a Huffman code),
+        so the intermediate results stay small and exact as long as possible.
+        """
+        heap = [(len(var._parts), i, var) for (i, var) in enumerate(variables)]
+        if len(heap) == 0:
+            raise Exception("at least one random variable is needed for the sum")
+
+        heapq.heapify(heap)
+        counter = len(heap)
+        while len(heap) > 1:
+            (_, _, var1) = heapq.heappop(heap)
+            (_, _, var2) = heapq.heappop(heap)
+            var = var1 + var2
+            heapq.heappush(heap, (len(var._parts), counter, var))
+            counter += 1
+
+        return heap[0][2]
+
+    @staticmethod
+    def compound(N, X: "RandomVariable") -> "RandomVariable":
+        """
+        Computes the distribution of X_1 + ... + X_N, where the X_i are independent copies of X
+        and the count N is an independent random variable with non negative integer values.
+        N can also be given as a pair (counts, probs), e.g. (k, stats.poisson(300).pmf(k)),
+        which is needed for counts with more than goalPartCount values, as a random variable merges them.
+        Probability missing from probs, e.g. of a cut off tail, is added to the cdf error.
+        """
+        weights = RandomVariable._countWeights(N)
+        counts = sorted(weights)
+        multiples = {}
+        powers = [X]
+
+        def multiple(k: int) -> "RandomVariable":
+            # X * k as sum of the cached X * 2^i
+            if k not in multiples:
+                ret = None
+                i = 0
+                while k >> i > 0:
+                    if i == len(powers):
+                        powers.append(powers[-1] + powers[-1])
+                    if (k >> i) & 1:
+                        ret = powers[i] if ret is None else ret + powers[i]
+                    i += 1
+                multiples[k] = ret
+            return multiples[k]
+
+        mixture = []
+        previous_count = 0
+        previous = None
+        for k in counts:
+            w = weights[k]
+            if k == 0:
+                mixture.append(part._Part(w, 0, 0, 0, 0))
+                continue
+
+            # reuse the sum for the previous count, so dense counts cost one addition each
+            current = multiple(k) if previous is None else previous + multiple(k - previous_count)
+            mixture += [part._Part(p._p * w, p._mean, p._square, p._min, p._max) for p in current._parts]
+            if len(mixture) > 2 * _goalPartCount(RandomVariable.goalPartCount):
+                mixture = RandomVariable._simplifyParts(mixture, X._focus)
+            previous_count = k
+            previous = current
+
+        ret = RandomVariable._fromParts(RandomVariable._simplifyParts(mixture, X._focus))
+        ret._focus = X._focus
+        ret._cdfError = RandomVariable._compoundError(N, X, weights)
         return ret
 
+    @staticmethod
+    def _compoundError(N, X, weights: dict):
+        """
+        returns the additional cdf error of compound(N, X):
+        X_1 + ... + X_k is within k times the error of X, so the mixture is within E[N] times that error.
+        Errors of the weights change the mixture by at most the error of N if the cdf of X * k is monotone in k,
+        i.e. if X does not change its sign, and otherwise by at most the error of N for each count.
+        """
+        (min_value, max_value) = X._minmax()
+        factor = 1 if min_value >= 0 or max_value <= 0 else len(weights)
+        return min(sum(k * w for (k, w) in weights.items()) * X._cdfError + factor * RandomVariable._countError(N, weights), Fraction(1))
+
+    @staticmethod
+    def _countWeights(N) -> dict:
+        if isinstance(N, tuple):
+            outcomes = [{"value": k, "p": p} for (k, p) in zip(*N)]
+        else:
+            outcomes = N.outcomes()
+        weights = {}
+        for outcome in outcomes:
+            k = outcome["value"]
+            if k < 0 or k != int(k):
+                raise Exception(
+                    "the count needs to have non negative integer values, "
+                    "pass (counts, probs) for counts with more than goalPartCount values")
+            weights[int(k)] = weights.get(int(k), 0) + Fraction(outcome["p"])
+        return {k: w for (k, w) in weights.items() if w > 0}
+
+    @staticmethod
+    def _countError(N, weights: dict):
+        # the probability missing from a count given as (counts, probs) is an error of its cdf
+        if isinstance(N, tuple):
+            return max(Fraction(1) - sum(weights.values()), Fraction(0))
+        return Fraction(N._cdfError)
+
+    def __neg__(self):
+        # mirroring reverses the order of the parts, so the parts are sorted by max afterwards
+        # this is (almost) sorted by min as well, which makes the sort linear in most cases
+        parts = [-part for part in reversed(self._parts)]
+        ret = RandomVariable._fromParts(sorted(parts, key=lambda p: p._min))
+        ret._cdfError = self._cdfError
+        if self._focus is not None:
+            ret._focus = [(-t, w) for (t, w) in self._focus]
+        return ret
+
+    def __sub__(self, other):
+        if not isinstance(other, RandomVariable):
+            return NotImplemented
+
+        return self + (-other)
+
     def __rmul__(self, other):
         if not isinstance(other, int):
             raise NotImplementedError
@@ -85,13 +731,18 @@ class RandomVariable:
 
     def __mul__(self, other):
         if isinstance(other, int):
-            if other <= 0:
+            if other == 0:
                 raise NotImplementedError
+            elif other < 0:
+                return -(self * -other)
             elif other == 1:
                 return self
             else:
-                res = self + self * (other - 1)
-                print("mul", other, len(res._parts))
+                # doubling needs only O(log(other)) additions
+                half = self * (other // 2)
+                res = half + half
+                if other % 2 == 1:
+                    res = res + self
                 return res
         elif not isinstance(other, RandomVariable):
             raise NotImplemented
@@ -100,7 +751,10 @@ class RandomVariable:
         for part1 in self._parts:
             for part2 in other._parts:
                 parts.append(part1 * part2)
-        return RandomVariable(_parts=parts)
+        ret = RandomVariable(_parts=parts)
+        # P(X * Y <= s) is an average of P(X <= s / y) or P(X >= s / y), so the errors add up
+        ret._cdfError = min(self._cdfError + other._cdfError, Fraction(1))
+        return ret
 
     def _minmax(self) -> tuple[Fraction, Fraction]:
         min_value = self._parts[0]._min
@@ -115,17 +769,12 @@ class RandomVariable:
             xscale: Literal["linear", "log"] = "linear",
             yscale: Literal["linear", "log"] = "linear",
             ignore_tails_p: Union[Fraction, int, float] = 0):
-        outcomes = sorted(self.outcomes(), key=lambda o: o["value"])
-        sum_p = Fraction(0)
-        x = []
-        y = []
-        for o in outcomes:
-            sum_p = o["p"]
-            if sum_p <= ignore_tails_p or sum_p >= 1 - ignore_tails_p:
-                continue
-
-            x.append(o["value"])
-            y.append(o["p"])
+        (values, numerators, denominators) = self.outcomes_array()
+        p = (numerators / denominators).astype(float)
+        sum_p = np.cumsum(p)
+        visible = (sum_p > ignore_tails_p) & (sum_p - p < 1 - ignore_tails_p)
+        x = values[visible].astype(float)
+        y = p[visible]
 
         fig, ax = plt.subplots()
         ax.set_xscale(xscale)
@@ -154,34 +803,21 @@ class RandomVariable:
             max_value = upper_value
         delta = (max_value - min_value) / steps
         delta_float = float(delta)
-        last_value = min_value
-        last_lower = Fraction(0)
-        last_upper = Fraction(0)
-        while last_value < max_value:
-            current_value = last_value + delta
-            (current_lower, current_upper) = self.cdf(current_value)
-
-            xmin = float(last_value)
+        points = [min_value + delta * (i + 1) for i in range(steps)]
+        (cumulative_lower, cumulative_upper) = self.cdf_table(points)
+        if cumulative:
+            (lower, upper) = (cumulative_lower, cumulative_upper)
+        else:
+            # the first bin also contains everything below min_value
+            (lower, upper) = RandomVariable._binBounds(
+                np.concatenate(([Fraction(0)], cumulative_lower)), np.concatenate(([Fraction(0)], cumulative_upper)))
+
+        for (i, (l, u)) in enumerate(zip(lower, upper)):
+            xmin = float(min_value + delta * i)
             xmax = xmin + delta_float
-            value = float(current_lower / 2 + current_upper / 2) if cumulative else \
-                float(current_lower / 2 + current_upper / 2 - last_lower / 2 - last_upper / 2)
-            ax.add_patch(Rectangle((xmin, 0), delta_float, value))
-            ax.hlines(
-                float(current_lower) if cumulative else float(current_lower - last_upper),
-                xmin,
-                xmax,
-                color="red"
-            )
-            ax.hlines(
-                float(current_upper) if cumulative else max(0, float(current_upper - last_lower)),
-                xmin,
-                xmax,
-                color="black"
-            )
-
-            last_value = current_value
-            last_lower = current_lower
-            last_upper = current_upper
+            ax.add_patch(Rectangle((xmin, 0), delta_float, float(l / 2 + u / 2)))
+            ax.hlines(float(l), xmin, xmax, color="red")
+            ax.hlines(float(u), xmin, xmax, color="black")
 
         ax.margins(0.01)
         ax.autoscale()
@@ -207,22 +843,20 @@ class RandomVariable:
         delta = (max_value - min_value) / steps
         delta_float = float(delta)
 
-        last_value = min_value
+        points = [min_value + delta * (i + 1) for i in range(steps)]
+        (lower, upper) = self.cdf_table(points)
         x = []
         y = []
         lx = []
         ly = []
         ux = []
         uy = []
-        while last_value < max_value:
-            current_value = last_value + delta
-            (current_lower, current_upper) = self.cdf(current_value)
-
+        for (current_value, current_lower, current_upper) in zip(points, lower, upper):
             value_float = float(current_value)
             current_p = float(current_lower / 2 + current_upper / 2)
             x.append(value_float)
             y.append(current_p)
-            
+
             lower_float = float(current_lower)
             lx.append(lower_float)
             ly.append(value_float)
@@ -234,20 +868,6 @@ class RandomVariable:
             uy.append(value_float - delta_float)
             ux.append(upper_float)
             uy.append(value_float)
-            #ax.vlines(
-            #    float(current_lower),
-            #    value_float,
-            #    value_float + delta_float,
-            #    color="red"
-            #)
-            #ax.vlines(
-            #    float(current_upper),
-            #    value_float - delta_float,
-            #    value_float,
-            #    color="black"
-            #)
-
-            last_value = current_value
 
         ax.margins(0.01)
         ax.autoscale()
@@ -266,15 +886,48 @@ class RandomVariable:
 
         return fig, ax
 
+    @staticmethod
+    def _coalescePoints(parts: List[part._Part]) -> List[part._Part]:
+        """
+        adds up the probabilities of point parts (min == max) with the same value, which is exact,
+        the coalesced part takes the position of the first one, so the order by min is kept
+        """
+        ret = []
+        points = {}
+        for p in parts:
+            if p._min != p._max:
+                ret.append(p)
+            elif p._min in points:
+                i = points[p._min]
+                ret[i] = part._Part._unchecked(ret[i]._p + p._p, ret[i]._mean, ret[i]._square, ret[i]._min, ret[i]._max)
+            else:
+                points[p._min] = len(ret)
+                ret.append(p)
+        return ret
+
+    @staticmethod
+    def _focusPenalty(value: float, focus: List[tuple], merged) -> float:
+        """
+        penalizes the heuristic value of a merge straddling focus thresholds by their weights,
+        scaled with the absolute value, so the penalty also increases negative values
+        """
+        weight = sum(w for (t, w) in focus if merged._min <= t < merged._max)
+        return value + weight * abs(value)
+
     @ staticmethod
-    def _simplifyParts(parts: List[part._Part]) -> List[part._Part]:
+    def _simplifyParts(parts: List[part._Part], focus: Union[List[tuple], None] = None) -> List[part._Part]:
         def heuristic(part1: part._Part, part2: part._Part, merged: part._Part):
             value = merged.cdf_uncertainty(exact_upper=False)
             value -= float(part1._p / mergedPart._p) * part1.cdf_uncertainty()
             value -= float(part2._p / mergedPart._p) * part2.cdf_uncertainty()
-            return float(merged._p) * value
-
-        goalPartCount = 800
+            value = float(merged._p) * value
+            if focus is not None:
+                value = RandomVariable._focusPenalty(value, focus, merged)
+            return value
+
+        # identical points are coalesced before any lossy merge
+        parts = RandomVariable._coalescePoints(parts)
+        goalPartCount = _goalPartCount(RandomVariable.goalPartCount)
         if len(parts) > goalPartCount:
             sortedParts = sorted(parts, key=lambda part: part._mean)
             mergeBounds = []
@@ -311,7 +964,7 @@ class RandomVariable:
             simplifiedParts.append(currentPart)
 
             if len(simplifiedParts) > 1.1 * goalPartCount:
-                return RandomVariable._simplifyParts(simplifiedParts)
+                return RandomVariable._simplifyParts(simplifiedParts, focus)
 
         else:
             simplifiedParts = parts[:]
@@ -324,7 +977,4 @@ class FairDie(RandomVariable):
         """
         Generates a fair die with n sides
         """
-        p = Fraction(1, n)
-        outcomes = [part.Outcome(p=p, value=i) for i in range(1, n + 1)]
-
-        super().__init__(outcomes)
+        self._parts = RandomVariable._partsFromArrays(np.arange(1, n + 1), np.ones(n, dtype=int), np.full(n, n))
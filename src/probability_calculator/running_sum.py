@@ -0,0 +1,42 @@
+class RunningSum:
+    def __init__(self, variables=[]):
+        """
+        Accumulates the sum of random variables which are added one at a time.
+        Like a binary counter, it keeps a stack of partial sums where each entry
+        is the sum of twice as many variables as the entry above it.
+        Only logarithmically many partial sums are kept and all additions are
+        between sums of the same number of variables.
+        """
+        self._stack = []
+        self._count = 0
+        for var in variables:
+            self.add(var)
+
+    def add(self, var) -> "RunningSum":
+        size = 1
+        while len(self._stack) > 0 and self._stack[-1][0] == size:
+            (_, partial_sum) = self._stack.pop()
+            var = partial_sum + var
+            size *= 2
+        self._stack.append((size, var))
+        self._count += 1
+        return self
+
+    def __iadd__(self, var) -> "RunningSum":
+        return self.add(var)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def result(self):
+        """
+        returns the sum of all variables added so far, further variables can be added afterwards
+        """
+        if len(self._stack) == 0:
+            raise Exception("no random variables have been added")
+
+        # start with the smallest partial sums
+        ret = self._stack[-1][1]
+        for (_, partial_sum) in reversed(self._stack[:-1]):
+            ret = partial_sum + ret
+        return ret
@@ -0,0 +1,37 @@
+import numpy as np
+
+
+def _aliasTable(probs: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Builds a Walker/Vose alias table for the given probabilities in O(n).
+    Returns the acceptance probabilities and the alias indices.
+    """
+    n = len(probs)
+    scaled = np.asarray(probs, dtype=float) * (n / np.sum(probs))
+    accept = np.ones(n)
+    alias = np.arange(n)
+    small = np.flatnonzero(scaled < 1.).tolist()
+    large = np.flatnonzero(scaled >= 1.).tolist()
+    scaled = scaled.tolist()
+    while small and large:
+        s = small.pop()
+        l = large.pop()
+        accept[s] = scaled[s]
+        alias[s] = l
+        scaled[l] = scaled[l] + scaled[s] - 1.
+        if scaled[l] < 1.:
+            small.append(l)
+        else:
+            large.append(l)
+
+    # the remaining entries are 1 up to rounding errors
+    return (accept, alias)
+
+
+def _sampleAlias(accept: np.ndarray, alias: np.ndarray, size, rng) -> np.ndarray:
+    """
+    Draws indices from an alias table with O(1) work per sample.
+    """
+    rng = np.random.default_rng(rng)
+    index = rng.integers(len(accept), size=size)
+    return np.where(rng.random(size) < accept[index], index, alias[index])
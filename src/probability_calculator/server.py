@@ -0,0 +1,239 @@
+import asyncio
+import hashlib
+import json
+import socket
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+from typing import List, Union
+from .random_variables import RandomVariable, FairDie
+from .numeric_random_variables import NumericRandomVariable, FairDie as NumericFairDie
+
+# Expressions are JSON objects:
+#   {"die": n}                                a fair die with n sides
+#   {"values": [...], "probs": [...]}         a discrete random variable, see from_arrays
+#   {"add": [expression, ...]}                the sum of independent random variables
+#   {"mul": [expression, k]}                  the sum of k independent copies
+#   {"neg": expression}
+# For the exact engine values and probabilities can also be given as strings like "1/3".
+# A request is one line {"engine": "numeric" | "exact", "expression": ..., "queries": [[method, argument], ...]},
+# where method is e.g. "cdf", "quantil_bounds" or "mean" (without argument).
+# The response is one line {"results": [...]} or {"error": "..."}.
+
+# the query methods of each engine, only the numeric engine prunes into a residual
+# and only the exact engine has the point estimate quantil
+_queryMethods = {
+    "exact": {
+        "cdf", "quantil_bounds", "quantil", "mean", "square",
+        "tail_expectation_bounds", "expected_shortfall_bounds"},
+    "numeric": {
+        "cdf", "quantil_bounds", "mean", "square", "residual_mass",
+        "tail_expectation_bounds", "expected_shortfall_bounds"},
+}
+
+
+def _key(engine: str, expression) -> str:
+    return hashlib.sha256(json.dumps([engine, expression], sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+def _number(engine: str, value):
+    return Fraction(value) if engine == "exact" else float(value)
+
+
+def _toJson(value):
+    if value is None:
+        return None
+    if isinstance(value, (tuple, list)):
+        return [_toJson(v) for v in value]
+    if isinstance(value, Fraction):
+        return str(value)
+    return float(value)
+
+
+def _leaf(engine: str, expression):
+    """
+    creates the random variable of an expression without sub expressions
+    """
+    if "die" in expression:
+        return FairDie(int(expression["die"])) if engine == "exact" else NumericFairDie(int(expression["die"]))
+    if "values" in expression:
+        values = [_number(engine, v) for v in expression["values"]]
+        probs = [_number(engine, p) for p in expression["probs"]]
+        if engine == "exact":
+            return RandomVariable.from_arrays(values, probs)
+        return NumericRandomVariable.from_arrays(values, probs)
+    raise Exception("unknown expression %s" % json.dumps(expression))
+
+
+def _combine(operation: str, variables: list, argument=None):
+    """
+    combines already evaluated sub expressions, this runs in the worker processes
+    """
+    if operation == "add":
+        return type(variables[0]).sum(variables)
+    if operation == "mul":
+        return variables[0] * argument
+    if operation == "neg":
+        return -variables[0]
+    raise Exception("unknown operation %s" % operation)
+
+
+class DistributionServer:
+    # maximal number of evaluated expressions kept in the cache
+    maxCacheSize = 256
+
+    def __init__(self, executor=None):
+        """
+        Evaluates expressions of random variables for many clients.
+        Identical expressions which are evaluated at the same time are only computed once,
+        the additions and multiplications run on executor (a process pool by default)
+        and the results are kept in a least recently used cache, which also covers sub expressions.
+        """
+        self._executor = executor if executor is not None else ProcessPoolExecutor()
+        self._cache = OrderedDict()
+        self._inFlight = {}
+        # set as soon as serve listens, the listening sockets are in _sockets
+        self._started = threading.Event()
+        self._sockets = []
+
+    async def evaluate(self, engine: str, expression):
+        if engine not in ("numeric", "exact"):
+            raise Exception("unknown engine %s" % engine)
+
+        key = _key(engine, expression)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        if key in self._inFlight:
+            return await asyncio.shield(self._inFlight[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self._inFlight[key] = future
+        try:
+            variable = await self._compute(engine, expression)
+        except Exception as e:
+            future.set_exception(e)
+            # the exception is raised to all waiting requests, this only marks it as retrieved
+            future.exception()
+            raise
+        except BaseException:
+            # e.g. the owning request was cancelled, the waiting requests must not wait forever
+            future.cancel()
+            raise
+        finally:
+            del self._inFlight[key]
+
+        future.set_result(variable)
+        self._cache[key] = variable
+        while len(self._cache) > self.maxCacheSize:
+            self._cache.popitem(last=False)
+        return variable
+
+    async def _compute(self, engine: str, expression):
+        loop = asyncio.get_running_loop()
+        if "add" in expression:
+            variables = await asyncio.gather(*[self.evaluate(engine, e) for e in expression["add"]])
+            return await loop.run_in_executor(self._executor, _combine, "add", list(variables))
+        if "mul" in expression:
+            (sub_expression, k) = expression["mul"]
+            variable = await self.evaluate(engine, sub_expression)
+            return await loop.run_in_executor(self._executor, _combine, "mul", [variable], int(k))
+        if "neg" in expression:
+            variable = await self.evaluate(engine, expression["neg"])
+            return _combine("neg", [variable])
+        return _leaf(engine, expression)
+
+    async def handle(self, request) -> dict:
+        """
+        answers a single decoded request
+        """
+        try:
+            engine = request.get("engine", "numeric")
+            variable = await self.evaluate(engine, request["expression"])
+            results = []
+            for query in request.get("queries", []):
+                (method, arguments) = (query[0], [_number(engine, a) for a in query[1:]])
+                if method not in _queryMethods[engine]:
+                    raise Exception("unknown query %s for the %s engine" % (method, engine))
+                results.append(_toJson(getattr(variable, method)(*arguments)))
+            return {"results": results}
+        except Exception as e:
+            return {"error": str(e)}
+
+    async def _handleConnection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError as e:
+                    response = {"error": "invalid request: %s" % e}
+                else:
+                    response = await self.handle(request)
+                writer.write((json.dumps(response) + "\n").encode())
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, path: Union[str, None] = None, host: str = "127.0.0.1", port: int = 8765):
+        """
+        serves requests on the unix socket path or, if path is None, on host:port until cancelled,
+        port 0 chooses a free port
+        """
+        if path is not None:
+            server = await asyncio.start_unix_server(self._handleConnection, path=path)
+        else:
+            server = await asyncio.start_server(self._handleConnection, host=host, port=port)
+        self._sockets = server.sockets
+        self._started.set()
+        async with server:
+            await server.serve_forever()
+
+
+class Client:
+    def __init__(self, path: Union[str, None] = None, host: str = "127.0.0.1", port: int = 8765):
+        """
+        A blocking client for a DistributionServer listening on the unix socket path or on host:port.
+        """
+        if path is not None:
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.connect(path)
+        else:
+            self._socket = socket.create_connection((host, port))
+        self._file = self._socket.makefile("rwb")
+
+    def query(self, expression, queries: List[list], engine: str = "numeric") -> list:
+        """
+        evaluates the queries, e.g. [["cdf", 10], ["mean"]], for the random variable given by expression.
+        Exact results are returned as strings like "1/3".
+        """
+        request = {"engine": engine, "expression": expression, "queries": queries}
+        self._file.write((json.dumps(request) + "\n").encode())
+        self._file.flush()
+        response = json.loads(self._file.readline())
+        if "error" in response:
+            raise Exception(response["error"])
+        return response["results"]
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="serve probability_calculator expressions")
+    parser.add_argument("--path", help="unix socket path, otherwise --host and --port are used")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    arguments = parser.parse_args()
+    asyncio.run(DistributionServer().serve(arguments.path, arguments.host, arguments.port))
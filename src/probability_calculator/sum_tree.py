@@ -0,0 +1,76 @@
+class SumTree:
+    def __init__(self, variables=[]):
+        """
+        Keeps the sum of many random variables, which can be replaced, added or removed one at a time.
+        Like a segment tree, it caches the partial sums of aligned blocks of 2, 4, 8, ... slots,
+        so a change only recomputes the logarithmically many partial sums containing its slot.
+        The variables are identified by the slot returned from add.
+        """
+        # _levels[0] are the variables, _levels[k][i] is the sum of the slots i * 2**k to (i + 1) * 2**k - 1
+        # or None if all of these slots are empty
+        self._levels = [list(variables)]
+        self._free = []
+        while len(self._levels[-1]) > 1:
+            below = self._levels[-1]
+            self._levels.append([SumTree._combine(*below[i:i + 2]) for i in range(0, len(below), 2)])
+
+    @staticmethod
+    def _combine(left, right=None):
+        if left is None:
+            return right
+        if right is None:
+            return left
+        return left + right
+
+    def _update(self, slot: int):
+        i = slot
+        k = 1
+        while len(self._levels[k - 1]) > 1:
+            if k == len(self._levels):
+                self._levels.append([])
+            i //= 2
+            level = self._levels[k]
+            while len(level) <= i:
+                level.append(None)
+            level[i] = SumTree._combine(*self._levels[k - 1][2 * i:2 * i + 2])
+            k += 1
+
+    def add(self, var) -> int:
+        """
+        adds a random variable and returns its slot
+        """
+        slot = self._free.pop() if len(self._free) > 0 else len(self._levels[0])
+        if slot == len(self._levels[0]):
+            self._levels[0].append(var)
+        else:
+            self._levels[0][slot] = var
+        self._update(slot)
+        return slot
+
+    def replace(self, slot: int, var):
+        if self._levels[0][slot] is None:
+            raise Exception("slot %d is empty" % slot)
+        self._levels[0][slot] = var
+        self._update(slot)
+
+    def remove(self, slot: int):
+        if self._levels[0][slot] is None:
+            raise Exception("slot %d is empty" % slot)
+        self._levels[0][slot] = None
+        self._free.append(slot)
+        self._update(slot)
+
+    def __getitem__(self, slot: int):
+        return self._levels[0][slot]
+
+    def __len__(self) -> int:
+        return len(self._levels[0]) - len(self._free)
+
+    def result(self):
+        """
+        returns the sum of all variables in the tree
+        """
+        ret = self._levels[-1][0] if len(self._levels[-1]) > 0 else None
+        if ret is None:
+            raise Exception("the sum tree is empty")
+        return ret
@@ -0,0 +1,101 @@
+import bisect
+import itertools
+import numpy as np
+
+
+def _tailExpectationBounds(t, full_p, full_pmean, straddling):
+    """
+    returns lower and upper bounds on E[X | X > t] or None if X > t is impossible.
+    full_p and full_pmean are the probability and partial expectation of the parts with min > t,
+    straddling is a list of (p, mean, min, max) of the parts with min <= t < max.
+    Works for Fractions as well as for floats.
+    """
+    # lower bound: parts with mean > t lie completely above t (at their mean),
+    # parts with mean <= t put as much mass as their mean allows just above t and the rest at min
+    lower_p = full_p
+    lower_pmean = full_pmean
+    # upper bound: parts put as much mass as their mean allows at max,
+    # parts with mean > t have to put at least the mass needed for their mean there
+    upper_p = full_p
+    upper_pmean = full_pmean
+    optional = []
+    for (p, mean, min_value, max_value) in straddling:
+        required = 0
+        if mean > t:
+            lower_p += p
+            lower_pmean += p * mean
+            required = p * (mean - t) / (max_value - t)
+            upper_p += required
+            upper_pmean += required * max_value
+        elif t > min_value:
+            q = p * (mean - min_value) / (t - min_value)
+            lower_p += q
+            lower_pmean += q * t
+        optional.append((max_value, p * (mean - min_value) / (max_value - min_value) - required))
+
+    # additional mass at max only increases the conditional expectation if max is larger
+    for (max_value, q) in sorted(optional, key=lambda o: o[0], reverse=True):
+        if q <= 0:
+            continue
+        if upper_p > 0 and max_value * upper_p <= upper_pmean:
+            break
+        upper_p += q
+        upper_pmean += q * max_value
+
+    if upper_p <= 0:
+        return None
+    # without mass forced above t, it can be arbitrarily close to t
+    lower = lower_pmean / lower_p if lower_p > 0 else t
+    return (max(lower, t), upper_pmean / upper_p)
+
+
+def _shortfallAtoms(values, probs):
+    """
+    sorts the atoms descending by value and returns (values, cumulative p, cumulative p * value)
+    """
+    atoms = sorted(((v, p) for (v, p) in zip(values, probs) if p > 0), key=lambda a: a[0], reverse=True)
+    return (
+        [v for (v, _) in atoms],
+        list(itertools.accumulate(p for (_, p) in atoms)),
+        list(itertools.accumulate(p * v for (v, p) in atoms)))
+
+
+def _expectedShortfall(atoms, alpha):
+    """
+    returns the mean of the largest 1 - alpha part of the probability mass of the atoms
+    """
+    (values, cumulative_p, cumulative_pvalue) = atoms
+    tail = 1 - alpha
+    if tail <= 0:
+        return values[0]
+    i = min(bisect.bisect_left(cumulative_p, tail), len(values) - 1)
+    (p, pvalue) = (cumulative_p[i - 1], cumulative_pvalue[i - 1]) if i > 0 else (0, 0)
+    return (pvalue + (tail - p) * values[i]) / tail
+
+
+def _mgfCoefficients(mean, square, max_value):
+    """
+    returns the coefficients (mean, a, b, d, c) of the upper bounds
+    log E[exp(lam * X) | part] <= lam * mean + logaddexp(a - lam * d, b + lam * c) for lam >= 0.
+    Among all distributions on [min, max] with the mean and square of a part, the two point distribution
+    on mean - variance / (max - mean) and max has the largest exponential moment (Bennett's inequality),
+    which only needs min <= mean - variance / (max - mean), i.e. the consistency of the part.
+    """
+    variance = np.maximum(square - mean**2, 0.)
+    c = max_value - mean
+    spread = c > 0
+    c_safe = np.where(spread, c, 1.)
+    with np.errstate(divide="ignore"):
+        normalization = np.log(c_safe**2 + variance)
+        a = np.where(spread, 2 * np.log(c_safe) - normalization, 0.)
+        b = np.where(spread, np.log(variance) - normalization, -np.inf)
+    # parts with mean == max are points at max, for them the bound is lam * mean
+    return (mean, a, b, np.where(spread, variance / c_safe, 0.), np.where(spread, c, 0.))
+
+
+def _logMgfBounds(logp, coefficients, lam):
+    """
+    returns upper bounds on log E[exp(lam * X); part] for all parts (rows) and tilts lam >= 0 (columns)
+    """
+    (mean, a, b, d, c) = (x[:, None] for x in coefficients)
+    return logp[:, None] + lam * mean + np.logaddexp(a - lam * d, b + lam * c)
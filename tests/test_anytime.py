@@ -0,0 +1,56 @@
+import unittest
+import numpy as np
+from probability_calculator.anytime import Refinement, anytime
+from probability_calculator.numeric_random_variables import NumericRandomVariable, FairDie
+
+
+class TestAnytime(unittest.TestCase):
+    def test_refinement(self):
+        n = 60
+        pmf = np.ones(1)
+        for _ in range(n):
+            pmf = np.convolve(pmf, np.ones(6) / 6)
+        truth = np.cumsum(pmf)
+
+        refinement = Refinement(lambda: FairDie(6) * n, scales=[1 / 32, 1 / 4, 1])
+        results = list(refinement)
+        self.assertEqual(len(results), 3)
+        self.assertLessEqual(len(results[0]._parts), 1.1 * NumericRandomVariable.goalPartCount / 32)
+        self.assertEqual(len(results[-1]._parts), len((FairDie(6) * n)._parts))
+        self.assertIs(refinement.future.result(), results[-1])
+        self.assertTrue(refinement.done())
+        for value in [150, 200, 210, 250]:
+            widths = []
+            for var in results:
+                (lower, upper) = var.cdf(value)
+                self.assertLessEqual(lower, truth[value - n] + 1e-9)
+                self.assertGreaterEqual(upper, truth[value - n] - 1e-9)
+                widths.append(upper - lower)
+            self.assertLess(widths[-1], widths[0])
+        # the scale only applies inside of the refinement
+        self.assertEqual(NumericRandomVariable.goalPartCount, 200)
+
+    def test_anytime(self):
+        (var, refinement) = anytime(lambda: FairDie(6) * 40, deadline=0.)
+        self.assertGreater(len(var._parts), 0)
+        final = refinement.future.result()
+        self.assertGreaterEqual(len(final._parts), len(var._parts))
+        self.assertIs(refinement.latest(), final)
+
+        (var, refinement) = anytime(lambda: FairDie(6) * 40, deadline=10.)
+        self.assertIs(var, refinement.future.result())
+
+    def test_cancel(self):
+        (var, refinement) = anytime(lambda: FairDie(6) * 40, deadline=0., refine=False)
+        list(refinement)
+        self.assertTrue(refinement.done())
+        self.assertLess(len(list(refinement)), len(Refinement.scales))
+
+    def test_error(self):
+        def compute():
+            raise Exception("failed")
+        refinement = Refinement(compute)
+        with self.assertRaises(Exception):
+            refinement.latest()
+        with self.assertRaises(Exception):
+            refinement.future.result()
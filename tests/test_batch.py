@@ -0,0 +1,76 @@
+import unittest
+import numpy as np
+from scipy import stats
+from probability_calculator.numeric_random_variables import NumericRandomVariable, FairDie
+from probability_calculator.batch import RandomVariableBatch
+
+
+class TestRandomVariableBatch(unittest.TestCase):
+    def test_roundtrip(self):
+        variables = [FairDie(2), FairDie(5)]
+        batch = RandomVariableBatch.from_variables(variables)
+        self.assertEqual(len(batch), 2)
+        for (var, converted) in zip(variables, batch.to_variables()):
+            self.assertEqual(converted._parts, var._parts)
+
+    def test_add(self):
+        variables = [FairDie(2), FairDie(3), FairDie(6)]
+        batch = RandomVariableBatch.from_variables(variables)
+        batch = batch + batch
+        (lower, upper) = batch.cdf(np.array([2., 3., 7.]))
+        np.testing.assert_allclose(lower, [1 / 4, 3 / 9, 21 / 36])
+        np.testing.assert_allclose(upper, [1 / 4, 3 / 9, 21 / 36])
+
+    def test_simplify_bounds(self):
+        n = 30
+        batch = RandomVariableBatch.from_variables([FairDie(n), FairDie(n + 1)])
+        total = batch
+        for _ in range(3):
+            total = total + batch
+        self.assertLessEqual(total._logp.shape[1], 1.1 * NumericRandomVariable.goalPartCount)
+
+        pmf = np.ones(n) / n
+        exact = np.convolve(np.convolve(pmf, pmf), np.convolve(pmf, pmf))
+        for value in [10., 50., 62.5, 100.]:
+            (lower, upper) = total.cdf(value)
+            p = np.sum(exact[np.arange(4, 4 * n + 1) <= value])
+            self.assertLessEqual(lower[0], p + 1e-12)
+            self.assertGreaterEqual(upper[0], p - 1e-12)
+
+    def test_simplify_width(self):
+        rng = np.random.default_rng(0)
+        variables = []
+        for size in [100, 200, 300]:
+            probs = rng.uniform(size=size)
+            variables.append(NumericRandomVariable.from_arrays(np.sort(rng.uniform(0., 10., size)), probs / np.sum(probs)))
+        batch = RandomVariableBatch.from_variables(variables)
+        total = batch + batch
+        values = np.linspace(0., 20., 201)
+        batch_width = np.mean([np.subtract(*total.cdf(value)[::-1]) for value in values])
+        totals = [var + var for var in variables]
+        scalar_width = np.mean([np.subtract(*var.cdf(value)[::-1]) for value in values for var in totals])
+        self.assertLessEqual(batch_width, 1.5 * scalar_width)
+
+    def test_quantil(self):
+        batch = RandomVariableBatch.from_variables([FairDie(4), FairDie(10)])
+        (lower, upper) = batch.quantil(0.5)
+        np.testing.assert_allclose(lower, [2., 5.])
+        np.testing.assert_allclose(upper, [2., 5.])
+
+    def test_cdf_error(self):
+        var = NumericRandomVariable.from_continuous(stats.norm(0, 1), parts=20, tail_mass=0.05)
+        batch = RandomVariableBatch.from_variables([var, FairDie(6)])
+        np.testing.assert_allclose(batch._cdfError, [0.05, 0.])
+        (lower, upper) = batch.cdf(-1.9)
+        self.assertLessEqual(lower[0], stats.norm.cdf(-1.9))
+        self.assertGreaterEqual(upper[0], stats.norm.cdf(-1.9))
+        (lower, upper) = batch.quantil(0.1)
+        self.assertLessEqual(lower[0], stats.norm.ppf(0.1))
+        self.assertGreaterEqual(upper[0], stats.norm.ppf(0.1))
+
+        total = (batch + batch).simplify()
+        np.testing.assert_allclose(total._cdfError, [0.1, 0.])
+        self.assertEqual([v._cdfError for v in total.to_variables()], [0.1, 0.])
+        (lower, upper) = total.cdf(-2.7)
+        self.assertLessEqual(lower[0], stats.norm.cdf(-2.7, scale=np.sqrt(2)))
+        self.assertGreaterEqual(upper[0], stats.norm.cdf(-2.7, scale=np.sqrt(2)))
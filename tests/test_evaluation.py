@@ -0,0 +1,39 @@
+import json
+import unittest
+from fractions import Fraction
+from unittest.mock import patch
+from probability_calculator import evaluation
+from probability_calculator.part import _Part
+from probability_calculator.random_variables import RandomVariable
+
+
+class TestEvaluation(unittest.TestCase):
+    def test_ground_truth(self):
+        (support, cdf) = evaluation._groundTruth([-1, 1], [Fraction(1, 2), Fraction(1, 2)], 3)
+        self.assertEqual(list(support), [-3, -2, -1, 0, 1, 2, 3])
+        self.assertEqual(list(cdf), [1 / 8, 1 / 8, 4 / 8, 4 / 8, 7 / 8, 7 / 8, 1.])
+
+    @patch.dict(evaluation.cases, {"small": ([1, 2, 3, 4, 5, 6], [Fraction(1, 6)] * 6, 8)})
+    def test_run(self):
+        rows = evaluation.run(["small"], goalPartCounts=[20, 800], maxMomentDenominators=[None, 1000])
+        self.assertEqual(len(rows), 6)
+        for row in rows:
+            self.assertLessEqual(row["max_error"], row["max_width"] + row["max_violation"] + 1e-12)
+            if row["engine"] == "numeric":
+                self.assertLess(row["max_violation"], 1e-9)
+            if row["goalPartCount"] == 800:
+                # identical points are coalesced, so no merging is needed and both engines are exact up to rounding
+                self.assertEqual(row["parts"], 41)
+                self.assertLess(row["max_width"], 1e-9)
+                self.assertLess(row["max_violation"], 1e-9)
+        self.assertEqual(RandomVariable.goalPartCount, 800)
+        self.assertEqual(_Part.maxMomentDenominator, 1000_000)
+        json.dumps(rows)
+        self.assertEqual(len(evaluation.format_table(rows).splitlines()), 7)
+
+    @patch.dict(evaluation.cases, {"coin": ([-1, 1], [Fraction(1, 2), Fraction(1, 2)], 100)})
+    def test_violation_at_jumps(self):
+        # merged points can carry a mean a few ulps above the jump, the bounds still have to contain F(x)
+        (row,) = evaluation.run(["coin"], engines=["numeric"], goalPartCounts=[50])
+        self.assertGreater(row["max_width"], 0.)
+        self.assertEqual(row["max_violation"], 0.)
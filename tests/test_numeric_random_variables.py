@@ -0,0 +1,521 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from math import exp, log
+from scipy import stats
+from probability_calculator.numeric_random_variables import NumericRandomVariable, FairDie
+from probability_calculator import numeric_part
+
+
+class TestNumericRandomVariables(unittest.TestCase):
+    def test_from_arrays(self):
+        var = NumericRandomVariable.from_arrays(
+            np.array([3., 1., 2., 1.]),
+            np.array([0.25, 0.125, 0.5, 0.125])
+        )
+        self.assertEqual(len(var._parts), 3)
+        self.assertEqual([part._mean for part in var._parts], [1., 2., 3.])
+        self.assertEqual(var.cdf(1.), (0.25, 0.25))
+        self.assertEqual(var.cdf(2.5), (0.75, 0.75))
+
+    def test_from_arrays_buckets(self):
+        n = 100_000
+        values = np.arange(n, dtype=float)
+        var = NumericRandomVariable.from_arrays(values, np.full(n, 1. / n))
+        self.assertLessEqual(len(var._parts), NumericRandomVariable.goalPartCount)
+        for value in [-1., 10.5, n / 3, n - 1.]:
+            (lower, upper) = var.cdf(value)
+            exact = np.sum(values <= value) / n
+            self.assertLessEqual(lower, exact + 1e-12)
+            self.assertGreaterEqual(upper, exact - 1e-12)
+
+    def test_fairdie(self):
+        var = FairDie(4)
+        self.assertEqual([part._mean for part in var._parts], [1., 2., 3., 4.])
+        self.assertAlmostEqual(var.cdf(2.)[0], 0.5)
+
+    def test_outcomes_array(self):
+        var = FairDie(3) + FairDie(3)
+        (values, probs) = var.outcomes_array()
+        self.assertEqual(values.tolist(), [2., 3., 4., 5., 6.])
+        np.testing.assert_allclose(probs, np.array([1., 2., 3., 2., 1.]) / 9)
+        # identical points are coalesced by the addition
+        self.assertEqual(len(list(var.iter_outcomes())), 5)
+
+    def test_outcomes_array_spread_part(self):
+        var = NumericRandomVariable.from_arrays(np.arange(1000.), np.full(1000, 1e-3))
+        (values, probs) = var.outcomes_array()
+        self.assertTrue(np.all(np.diff(values) > 0))
+        self.assertAlmostEqual(np.sum(probs), 1.)
+        self.assertAlmostEqual(np.sum(values * probs), 499.5)
+        self.assertAlmostEqual(sum(o["p"] for o in var.outcomes()), 1.)
+
+    def test_sample(self):
+        var = FairDie(6) + FairDie(6)
+        samples = var.sample(100_000, rng=np.random.default_rng(1))
+        self.assertEqual(samples.min(), 2.)
+        self.assertEqual(samples.max(), 12.)
+        self.assertAlmostEqual(np.mean(samples == 7.), 1 / 6, delta=0.01)
+        self.assertAlmostEqual(np.mean(samples), 7., delta=0.05)
+
+    def test_prob_less(self):
+        var1 = FairDie(6) * 3
+        var2 = FairDie(20)
+        (lower, upper) = var1.prob_less(var2)
+        exact = 0.
+        pmf = np.convolve(np.convolve(np.ones(6), np.ones(6)), np.ones(6)) / 216
+        for y in range(1, 21):
+            exact += np.sum(pmf[np.arange(3, 19) < y]) / 20
+        self.assertLessEqual(lower, exact + 1e-12)
+        self.assertGreaterEqual(upper, exact - 1e-12)
+        # all parts are points, so the ties are resolved exactly
+        self.assertLess(upper - lower, 1e-12)
+        (lower_greater, upper_greater) = var2.prob_greater(var1)
+        self.assertAlmostEqual(lower_greater, lower)
+        self.assertAlmostEqual(upper_greater, upper)
+
+    def test_cdf_sweep(self):
+        var = NumericRandomVariable.from_arrays(np.arange(1000.), np.full(1000, 1e-3))
+        values = [-1., 3.5, 100., 512.25, 999., 1e4]
+        for ((lower, upper), value) in zip(var._cdfSweep(values), values):
+            self.assertAlmostEqual(lower, var.cdf(value)[0])
+            self.assertAlmostEqual(upper, var.cdf(value)[1])
+
+    def test_neg(self):
+        var = FairDie(6) * 40
+        negated = -var
+        self.assertEqual(
+            [part._min for part in negated._parts],
+            sorted(part._min for part in negated._parts))
+        pmf = np.ones(1)
+        for _ in range(40):
+            pmf = np.convolve(pmf, np.ones(6) / 6)
+        for value in [-200., -140., -100.5]:
+            (lower, upper) = negated.cdf(value)
+            # P(-X <= v) = P(X >= -v)
+            exact = np.sum(pmf[np.arange(40, 241) >= -value])
+            self.assertLessEqual(lower, exact + 1e-12)
+            self.assertGreaterEqual(upper, exact - 1e-12)
+
+    def test_sub(self):
+        var = FairDie(6) - FairDie(6)
+        (values, probs) = var.outcomes_array()
+        self.assertEqual(values.tolist(), list(range(-5, 6)))
+        np.testing.assert_allclose(probs, np.array([1, 2, 3, 4, 5, 6, 5, 4, 3, 2, 1]) / 36)
+
+    def test_sum(self):
+        variables = [FairDie(n) for n in [2, 20, 3, 6, 6, 4]]
+        var = NumericRandomVariable.sum(iter(variables))
+        (values, probs) = var.outcomes_array()
+        pmf = np.ones(1)
+        for n in [2, 20, 3, 6, 6, 4]:
+            pmf = np.convolve(pmf, np.ones(n) / n)
+        np.testing.assert_allclose(values, np.arange(6, 42))
+        np.testing.assert_allclose(probs, pmf[pmf > 1e-14])
+
+    def test_prune(self):
+        var = NumericRandomVariable.from_arrays(np.array([0., 1., 2.]), np.array([1e-9, 0.5, 0.5 - 1e-9]))
+        try:
+            NumericRandomVariable.pruneThreshold = 1e-6
+            total = var + var + var
+            # small points coalesced with large points of the same value are kept,
+            # only the sums with the residual of var + var and the point 2 = 2 + 0 are pruned
+            self.assertAlmostEqual(total.residual_mass(), 1.25e-9, delta=1e-12)
+            self.assertAlmostEqual(sum(exp(part._logp) for part in total._parts), 1.)
+            pmf = np.array([1e-9, 0.5, 0.5 - 1e-9])
+            pmf = np.convolve(np.convolve(pmf, pmf), pmf)
+            for value in [0., 0.5, 1., 2., 3., 5., 6.]:
+                (lower, upper) = total.cdf(value)
+                exact = np.sum(pmf[np.arange(7) <= value])
+                self.assertLessEqual(lower, exact + 1e-12)
+                self.assertGreaterEqual(upper, exact - 1e-12)
+            self.assertAlmostEqual((-total).residual_mass(), total.residual_mass())
+        finally:
+            NumericRandomVariable.pruneThreshold = 0.
+
+        self.assertEqual((var + var).residual_mass(), 0.)
+
+    def test_compound_lattice(self):
+        count = NumericRandomVariable.from_arrays(np.array([0., 1., 3.]), np.array([0.2, 0.5, 0.3]))
+        var = NumericRandomVariable.compound(count, FairDie(4))
+        die = np.ones(4) / 4
+        exact = np.zeros(13)
+        exact[0] += 0.2
+        exact[1:5] += 0.5 * die
+        exact[3:13] += 0.3 * np.convolve(np.convolve(die, die), die)
+        (values, probs) = var.outcomes_array()
+        np.testing.assert_allclose(values, np.flatnonzero(exact))
+        np.testing.assert_allclose(probs, exact[exact > 0])
+
+    def test_compound_wide_lattice(self):
+        count = NumericRandomVariable.from_arrays(np.arange(0., 11.), np.full(11, 1 / 11))
+        # the gcd reduces the values to the lattice {0, 1}
+        thousands = NumericRandomVariable.from_arrays(np.array([0., 20000.]), np.array([0.5, 0.5]))
+        self.assertEqual(thousands._latticePmf()[:2], (0, 20000))
+        var = NumericRandomVariable.compound(count, thousands)
+        self.assertAlmostEqual(var.cdf(0.)[0], sum(0.5**k for k in range(11)) / 11)
+        self.assertAlmostEqual(var.cdf(200000.)[0], 1.)
+        self.assertEqual(var.cdf(199999.)[1], var.cdf(180000.)[1])
+
+        # sparse values fall back to the doubling path
+        sparse = NumericRandomVariable.from_arrays(np.array([1., 20000.]), np.array([0.5, 0.5]))
+        self.assertIsNone(sparse._latticePmf())
+        var = NumericRandomVariable.compound(count, sparse)
+        (lower, upper) = var.cdf(19999.)
+        exact = sum(0.5**k for k in range(11)) / 11
+        self.assertLessEqual(lower, exact + 1e-12)
+        self.assertGreaterEqual(upper, exact - 1e-12)
+
+    def test_compound_count_pmf(self):
+        # a count with more values than goalPartCount would be merged by from_arrays
+        k = np.arange(0., 201.)
+        var = NumericRandomVariable.compound((k, np.full(201, 1 / 201)), FairDie(6))
+        self.assertAlmostEqual(var.mean(), 100 * 3.5)
+        self.assertLess(var._cdfError, 1e-12)
+
+        k = np.arange(0., 601.)
+        var = NumericRandomVariable.compound((k, stats.poisson(300).pmf(k)), FairDie(2))
+        self.assertAlmostEqual(var.mean(), 450., places=6)
+        (lower, upper) = var.cdf(450.)
+        self.assertLessEqual(lower, 0.5 + 0.02)
+        self.assertGreaterEqual(upper, 0.5 - 0.02)
+        self.assertLess(upper - lower, 0.05)
+
+    def test_compound(self):
+        count = NumericRandomVariable.from_arrays(np.arange(0., 30.), np.full(30, 1 / 30))
+        severity = NumericRandomVariable.from_arrays(np.array([0.5, 1.25, 4.]), np.array([0.5, 0.25, 0.25]))
+        var = NumericRandomVariable.compound(count, severity)
+        self.assertLessEqual(len(var._parts), 1.1 * NumericRandomVariable.goalPartCount)
+        (lower, upper) = var.cdf(10.)
+        samples = severity.sample((200_000, 29), rng=2)
+        counts = count.sample(200_000, rng=3).astype(int)
+        totals = np.where(np.arange(29) < counts[:, None], samples, 0.).sum(axis=1)
+        estimate = np.mean(totals <= 10.)
+        self.assertLessEqual(lower, estimate + 0.01)
+        self.assertGreaterEqual(upper, estimate - 0.01)
+
+    def test_mean(self):
+        var = FairDie(6) + FairDie(4)
+        self.assertAlmostEqual(var.mean(), 6.)
+        self.assertAlmostEqual(var.square() - var.mean()**2, 35 / 12 + 15 / 12)
+
+    def test_normal_approximation(self):
+        n = 200
+        try:
+            NumericRandomVariable.cltThreshold = 100
+            var = FairDie(6) * n
+        finally:
+            NumericRandomVariable.cltThreshold = None
+        self.assertGreater(var._cdfError, 0.)
+        self.assertAlmostEqual(var.mean(), 3.5 * n)
+
+        pmf = np.ones(1)
+        for _ in range(n):
+            pmf = np.convolve(pmf, np.ones(6) / 6)
+        values = np.arange(n, 6 * n + 1)
+        for value in [n - 1., 600., 680.5, 700., 735., 6. * n]:
+            (lower, upper) = var.cdf(value)
+            exact = np.sum(pmf[values <= value])
+            self.assertLessEqual(lower, exact + 1e-12)
+            self.assertGreaterEqual(upper, exact - 1e-12)
+
+        self.assertEqual((FairDie(6) * 3)._cdfError, 0.)
+
+    def test_from_continuous(self):
+        dist = stats.norm(1., 2.)
+        var = NumericRandomVariable.from_continuous(dist, parts=50, tail_mass=1e-6)
+        self.assertEqual(len(var._parts), 50)
+        self.assertEqual(var._cdfError, 1e-6)
+        self.assertAlmostEqual(var.mean(), 1., places=6)
+        for value in [-5., -1., 0.5, 1., 3.7]:
+            (lower, upper) = var.cdf(value)
+            self.assertLessEqual(lower, dist.cdf(value))
+            self.assertGreaterEqual(upper, dist.cdf(value))
+
+        with self.assertRaises(Exception):
+            NumericRandomVariable.from_continuous(dist)
+
+    def test_from_continuous_heavy_tail(self):
+        dist = stats.lognorm(2.)
+        var = NumericRandomVariable.from_continuous(dist, parts=10, tail_mass=1e-3)
+        last = var._parts[-1]
+        expected = dist.expect(lambda x: x, lb=last._min, ub=last._max, conditional=True)
+        self.assertAlmostEqual(last._mean, expected, delta=1e-6 * expected)
+        self.assertAlmostEqual(var.mean(), dist.expect(lambda x: x, lb=var._parts[0]._min, ub=last._max, conditional=True), places=6)
+
+    def test_pscale_does_not_modify(self):
+        var = FairDie(6)
+        logp = [part._logp for part in var._parts]
+        scaled = var.pscale(0.5)
+        self.assertEqual([part._logp for part in var._parts], logp)
+        self.assertAlmostEqual(sum(exp(part._logp) for part in scaled._parts), 0.5)
+
+    def test_query_parallel(self):
+        var = FairDie(6) + FairDie(6) + FairDie(6)
+        queries = [("cdf", v / 3) for v in range(0, 60)] + [("quantil_bounds", q / 50) for q in range(51)]
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = var.query_parallel(queries, executor, batch_size=7)
+
+        for ((name, value), result) in zip(queries, results):
+            expected = getattr(var, name)(value)
+            self.assertAlmostEqual(result[0], expected[0])
+            self.assertAlmostEqual(result[1], expected[1])
+
+        self.assertEqual(var.quantil_bounds(0.6), (11., 11.))
+        self.assertEqual(var.quantil_bounds(1.), (18., 18.))
+
+    def test_cdf_table(self):
+        var = (FairDie(6) + FairDie(6)) * 3
+        points = [30., -1., 12.5, 21., 21., 7.]
+        (lower, upper) = var.cdf_table(points)
+        for (value, l, u) in zip(points, lower, upper):
+            self.assertAlmostEqual(l, var.cdf(value)[0])
+            self.assertAlmostEqual(u, var.cdf(value)[1])
+
+        edges = [0., 10., 20., 30., 40.]
+        (lower, upper) = var.histogram_bounds(edges)
+        self.assertEqual(len(lower), 4)
+        for i in range(4):
+            self.assertLessEqual(lower[i], upper[i] + 1e-12)
+            self.assertAlmostEqual(lower[i], max(var.cdf(edges[i + 1])[0] - var.cdf(edges[i])[1], 0.))
+        self.assertAlmostEqual(sum(lower), 1.)
+
+    def test_log_exp(self):
+        var = NumericRandomVariable.from_arrays([1., 2.], [0.5, 0.5])
+        product = (var.log() * 3).exp()
+        (values, probs) = product.outcomes_array()
+        np.testing.assert_allclose(values, [1., 2., 4., 8.])
+        np.testing.assert_allclose(probs, [1 / 8, 3 / 8, 3 / 8, 1 / 8])
+        self.assertEqual(product._cdfError, 0.)
+
+        # P(exp(U) <= exp(x)) = x / 10 for U uniform on [0, 10],
+        # the parts alone (pscale drops the source) are valid with the cdf error as well
+        for parts in [1, 20]:
+            source = NumericRandomVariable.from_continuous(stats.uniform(0., 10.), parts=parts)
+            var = source.exp()
+            self.assertLessEqual(var._cdfError, 1 / parts)
+            self.assertEqual(var._minmax(), (1., exp(10.)))
+            for x in np.linspace(0., 10., 101):
+                for bounds in [var.cdf(exp(x)), var.pscale(1.).cdf(exp(x))]:
+                    self.assertLessEqual(bounds[0], x / 10 + 1e-12)
+                    self.assertGreaterEqual(bounds[1], x / 10 - 1e-12)
+            # inside the parts of U the transferred bounds are those of U
+            for x in np.linspace(0.05, 9.95, 100):
+                np.testing.assert_allclose(var.cdf(exp(x)), source.cdf(x), atol=1e-9)
+
+        dist = stats.norm(0., 3.)
+        var = NumericRandomVariable.from_continuous(dist, parts=20, tail_mass=1e-4)
+        mapped = var.exp()
+        for x in np.linspace(-10., 10., 201):
+            for bounds in [mapped.cdf(exp(x)), mapped.pscale(1.).cdf(exp(x))]:
+                self.assertLessEqual(bounds[0], dist.cdf(x) + 1e-12)
+                self.assertGreaterEqual(bounds[1], dist.cdf(x) - 1e-12)
+        self.assertEqual(mapped.log()._minmax(), var._minmax())
+
+        with self.assertRaises(Exception):
+            (-FairDie(6)).log()
+
+    def test_product_of_logs(self):
+        # the product of 10 uniforms on [1, 2] as exp of the sum of the logs
+        var = NumericRandomVariable.from_continuous(stats.uniform(1., 1.), parts=100)
+        logs = var.log()
+        self.assertLess(logs._cdfError, 1e-4)
+        total = logs * 10
+        product = total.exp()
+
+        # the sums of the logs rounded down and up to a grid bound the true cdf from above and below
+        h = 1e-3
+        pmf = np.diff(np.minimum(np.exp(np.arange(0., log(2.) + h, h)) - 1, 1.))
+        exact = pmf
+        for _ in range(9):
+            exact = np.convolve(exact, pmf)
+        for x in [2., 3., 3.86, 4.5, 5.5]:
+            true_lower = np.sum(exact[:max(int(np.floor(x / h)) - 9, 0)])
+            true_upper = np.sum(exact[:int(np.floor(x / h)) + 1])
+            (lower, upper) = product.cdf(exp(x))
+            self.assertLessEqual(lower, true_upper)
+            self.assertGreaterEqual(upper, true_lower)
+            self.assertLess(upper - lower, 0.03)
+        (lower, upper) = total.quantil_bounds(0.5)
+        np.testing.assert_allclose(product.quantil_bounds(0.5), (exp(lower), exp(upper)))
+
+    def test_apply(self):
+        var = FairDie(6) + FairDie(6)
+        (values, probs) = var.outcomes_array()
+        capped = var.apply(lambda x: min(x, 9.))
+        (capped_values, capped_probs) = capped.outcomes_array()
+        np.testing.assert_allclose(capped_values, np.arange(2., 10.))
+        self.assertAlmostEqual(capped_probs[-1], sum(probs[values >= 9]))
+
+        mirrored = var.apply(np.negative, monotone="decreasing")
+        self.assertEqual(mirrored._minmax(), (-12., -2.))
+        self.assertAlmostEqual(mirrored.mean(), -7.)
+
+        # a wide part, the breakpoint at 0 is the minimum of abs inside it
+        wide = NumericRandomVariable.from_continuous(stats.uniform(-1., 3.), parts=1)
+        mapped = wide.apply(np.abs, monotone="piecewise", breakpoints=[0.])
+        self.assertEqual(mapped._minmax(), (0., 2.))
+        self.assertAlmostEqual(exp(mapped._parts[0]._logp), 1.)
+        self.assertLess(mapped._cdfError, 1.)
+
+        # P(|U| <= v) for U uniform on [-1, 2] and P(exp(-U) <= exp(v - 1)) = P(U >= 1 - v)
+        wide = NumericRandomVariable.from_continuous(stats.uniform(-1., 3.), parts=6)
+        mapped = wide.apply(np.abs, monotone="piecewise", breakpoints=[0.])
+        decreasing = wide.apply(lambda x: exp(-x), monotone="decreasing")
+        self.assertLessEqual(mapped._cdfError, 1 / 3)
+        self.assertLessEqual(decreasing._cdfError, 1 / 6)
+        for v in np.linspace(0., 2., 41):
+            true_cdf = 2 * v / 3 if v <= 1 else (v + 1) / 3
+            (lower, upper) = mapped.cdf(v)
+            self.assertLessEqual(lower, true_cdf + 1e-12)
+            self.assertGreaterEqual(upper, true_cdf - 1e-12)
+            (lower, upper) = decreasing.cdf(exp(v - 1))
+            self.assertLessEqual(lower, (1 + v) / 3 + 1e-12)
+            self.assertGreaterEqual(upper, (1 + v) / 3 - 1e-12)
+
+        # the parts above the cap are mapped to a single value and are exact
+        capped = wide.apply(lambda x: min(x, 0.))
+        self.assertLessEqual(capped._cdfError, 1 / 6)
+        self.assertEqual(capped.cdf(0.)[1], 1.)
+
+        with self.assertRaises(Exception):
+            var.apply(np.abs, monotone="unknown")
+
+    def test_apply_merged_parts(self):
+        # the parts of a sum are wide and overlap, V is normal with standard deviation 2
+        total = NumericRandomVariable.from_continuous(stats.norm(0., 1.), parts=20, tail_mass=1e-6) * 4
+        dist = stats.norm(0., 2.)
+        absolute = total.apply(
+            np.abs, monotone="piecewise", breakpoints=[0.], derivative=np.sign, second_derivative=np.zeros_like)
+        estimated = total.apply(np.abs, monotone="piecewise", breakpoints=[0.])
+        self.assertLess(absolute._cdfError, estimated._cdfError)
+        decreasing = total.apply(
+            lambda x: exp(-x), monotone="decreasing",
+            derivative=lambda x: -exp(-x), second_derivative=lambda x: exp(-x))
+        for v in np.linspace(0.05, 6., 40):
+            # P(|V| <= v) and P(exp(-V) <= exp(v - 3)) = P(V >= 3 - v)
+            for (var, value, true_cdf) in [
+                    (absolute, v, 2 * dist.cdf(v) - 1),
+                    (absolute.pscale(1.), v, 2 * dist.cdf(v) - 1),
+                    (estimated, v, 2 * dist.cdf(v) - 1),
+                    (decreasing, exp(v - 3), dist.sf(3 - v)),
+                    (decreasing.pscale(1.), exp(v - 3), dist.sf(3 - v))]:
+                (lower, upper) = var.cdf(value)
+                self.assertLessEqual(lower, true_cdf + 1e-12)
+                self.assertGreaterEqual(upper, true_cdf - 1e-12)
+
+        # the bounds transferred from V are much tighter than those of the mapped parts
+        (lower, upper) = absolute.cdf(2.)
+        self.assertLess(upper - lower, 0.5)
+        (lower, upper) = decreasing.cdf(1.)
+        self.assertLess(upper - lower, 0.2)
+        np.testing.assert_allclose(np.ravel(absolute.cdf_table([2.])), absolute.cdf(2.))
+
+    def test_tail_bounds(self):
+        n = 80
+        var = FairDie(6) * n
+        self.assertLess(len(var._parts), 5 * n + 1)
+        pmf = np.ones(1)
+        for _ in range(n):
+            pmf = np.convolve(pmf, np.ones(6) / 6)
+        values = np.arange(n, 6 * n + 1)
+
+        thresholds = np.array([200., 280., 300.5, 350.])
+        (lower, upper) = var.tail_expectation_bounds(thresholds)
+        for (t, l, u) in zip(thresholds, lower, upper):
+            above = values > t
+            exact = np.sum(pmf[above] * values[above]) / np.sum(pmf[above])
+            self.assertLessEqual(l, exact + 1e-9)
+            self.assertGreaterEqual(u, exact - 1e-9)
+            self.assertEqual(var.tail_expectation_bounds(t), (l, u))
+        self.assertIsNone(var.tail_expectation_bounds(6. * n))
+
+        for alpha in [0.5, 0.9, 0.99]:
+            cumulative = np.cumsum(pmf[::-1])
+            tail = 1 - alpha
+            i = np.searchsorted(cumulative, tail)
+            exact = (np.sum((pmf * values)[::-1][:i]) + (tail - (cumulative[i - 1] if i > 0 else 0.)) * values[::-1][i]) / tail
+            (l, u) = var.expected_shortfall_bounds(alpha)
+            self.assertLessEqual(l, exact + 1e-9)
+            self.assertGreaterEqual(u, exact - 1e-9)
+
+    def test_focus(self):
+        previous = NumericRandomVariable.goalPartCount
+        NumericRandomVariable.goalPartCount = 20
+        try:
+            var = NumericRandomVariable.from_arrays(np.arange(30.), np.ones(30) / 30)
+            for t in [10., 45., 55.]:
+                (lower, upper) = (var + var).cdf(t)
+                focused = var.with_focus([(t, 100)]) + var
+                (focused_lower, focused_upper) = focused.cdf(t)
+                self.assertLess(focused_upper - focused_lower, (upper - lower) / 2)
+                self.assertEqual(focused._focus, [(t, 100)])
+                self.assertEqual((-focused)._focus, [(-t, 100)])
+                self.assertEqual((focused + focused)._focus, [(t, 100)])
+        finally:
+            NumericRandomVariable.goalPartCount = previous
+
+    def test_focus_penalty(self):
+        # the penalty increases the heuristic value of a straddling merge regardless of its sign
+        merged = numeric_part._Part(log(0.5), 1., 1.5, 0., 2.)
+        for value in [-2., -0.5, 0.5, 2.]:
+            penalized = [NumericRandomVariable._focusPenalty(value, [(1, w)], merged) for w in [0, 1, 10]]
+            self.assertEqual(penalized[0], value)
+            self.assertLess(penalized[0], penalized[1])
+            self.assertLess(penalized[1], penalized[2])
+            self.assertEqual(NumericRandomVariable._focusPenalty(value, [(5, 10)], merged), value)
+
+    def test_coalesce_points(self):
+        var = FairDie(6) + FairDie(6)
+        self.assertEqual(len(var._parts), 11)
+        for (k, part) in enumerate(var._parts):
+            self.assertAlmostEqual(exp(part._logp), min(k + 1, 11 - k) / 36)
+
+    def test_chernoff_tail_bound(self):
+        n = 20
+        die = FairDie(6)
+        pmf = np.ones(1)
+        for _ in range(n):
+            pmf = np.convolve(pmf, np.ones(6) / 6)
+        values = np.arange(n, 6 * n + 1)
+        total = die * n
+
+        thresholds = np.array([70., 80., 95.5, 110., 119.])
+        bounds = NumericRandomVariable.chernoff_tail_bound([die] * n, thresholds)
+        for (t, bound) in zip(thresholds, bounds):
+            exact = np.sum(pmf[values > t])
+            self.assertGreaterEqual(bound, exact)
+            self.assertGreaterEqual(bound, 1 - total.cdf(t)[1] - 1e-12)
+            self.assertLessEqual(bound, 1.)
+            self.assertAlmostEqual(NumericRandomVariable.chernoff_tail_bound([die] * n, t), bound)
+        # the bound decays exponentially
+        self.assertLess(bounds[3], 1e-6)
+        self.assertEqual(NumericRandomVariable.chernoff_tail_bound([die] * n, 6. * n), 0.)
+
+        # different variables and parts with a spread
+        uniform = NumericRandomVariable.from_continuous(stats.uniform(0, 1), parts=10)
+        var = NumericRandomVariable.from_arrays(np.array([0., 1.]), np.array([0.5, 0.5]))
+        for t in [1., 1.5, 1.9]:
+            # P(U + B > t) = P(B = 1) P(U > t - 1) + P(B = 0) P(U > t)
+            exact = 0.5 * (1 - min(max(t - 1, 0), 1)) + 0.5 * (1 - min(t, 1))
+            self.assertGreaterEqual(NumericRandomVariable.chernoff_tail_bound([uniform, var], t), exact)
+
+    def test_cdf_error_propagation(self):
+        var = NumericRandomVariable.from_continuous(stats.norm(0, 1), parts=20, tail_mass=0.05)
+        count = NumericRandomVariable.from_arrays(np.array([1., 2.]), np.array([0.5, 0.5]))
+        compound = NumericRandomVariable.compound(count, var)
+        exact = 0.5 * stats.norm.cdf(-1.9) + 0.5 * stats.norm.cdf(-1.9, scale=np.sqrt(2))
+        (lower, upper) = compound.cdf(-1.9)
+        self.assertLessEqual(lower, exact)
+        self.assertGreaterEqual(upper, exact)
+        # X changes its sign, so the weights could contribute, but N has no error
+        self.assertAlmostEqual(compound._cdfError, 1.5 * 0.05)
+
+        lattice = NumericRandomVariable.compound(count, FairDie(6).with_focus([]))
+        self.assertEqual(lattice._cdfError, 0.)
+
+        self.assertAlmostEqual(var.pscale(0.5)._cdfError, 0.025)
+        self.assertAlmostEqual(var.concat(FairDie(2))._cdfError, 0.05)
+        self.assertEqual([v._cdfError for v in var.split(0.)], [0.05, 0.05])
+        positive = NumericRandomVariable.from_continuous(stats.norm(10, 1), parts=4, tail_mass=0.05)
+        self.assertAlmostEqual((positive * positive)._cdfError, 0.1)
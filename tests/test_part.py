@@ -37,6 +37,10 @@ class TestPart(unittest.TestCase):
         self.assertEqual(part._min, 14)
         self.assertEqual(part._max, 40)
 
+    def test_neg(self):
+        part = -_Part(Fraction(1, 10), 3, 10, 1, 4)
+        self.assertEqual(part, _Part(Fraction(1, 10), -3, 10, -4, -1))
+
     def test_outcomes(self):
         part = _Part(Fraction(1, 10), 1, Fraction(5, 3), 0, 2)
         outcomes = part.outcomes()
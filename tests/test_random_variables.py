@@ -1,6 +1,10 @@
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from fractions import Fraction
+import numpy as np
+from scipy import stats
 from probability_calculator.random_variables import RandomVariable, FairDie
+from probability_calculator.part import _Part
 
 
 class TestRandomVariables(unittest.TestCase):
@@ -89,4 +93,266 @@ class TestRandomVariables(unittest.TestCase):
         self.assertEqual(var.cdf(1), (Fraction(7, 10), Fraction(7, 10)))
         self.assertEqual(var.cdf(2), (Fraction(7, 10), Fraction(7, 10)))
         self.assertEqual(var.cdf(3), (Fraction(1), Fraction(1)))
-        self.assertEqual(var.cdf(4), (Fraction(1), Fraction(1)))
\ No newline at end of file
+        self.assertEqual(var.cdf(4), (Fraction(1), Fraction(1)))
+
+    def test_from_arrays(self):
+        var = RandomVariable.from_arrays(
+            [3, 1, 2, 1],
+            [Fraction(1, 3), Fraction(1, 6), Fraction(1, 3), Fraction(1, 6)]
+        )
+        expected = [
+            {"p": Fraction(1, 3), "value": 1},
+            {"p": Fraction(1, 3), "value": 2},
+            {"p": Fraction(1, 3), "value": 3}
+        ]
+        self.assertEqual(var.outcomes(), expected)
+
+    def test_from_arrays_denominators(self):
+        var = RandomVariable.from_arrays([2, 1, 2], [1, 1, 1], [2, 4, 4])
+        expected = [
+            {"p": Fraction(1, 4), "value": 1},
+            {"p": Fraction(3, 4), "value": 2}
+        ]
+        self.assertEqual(var.outcomes(), expected)
+
+    def test_from_arrays_buckets(self):
+        n = 2 * RandomVariable.goalPartCount
+        var = RandomVariable.from_arrays(range(n), [1] * n, [n] * n)
+        self.assertLessEqual(len(var._parts), RandomVariable.goalPartCount)
+        self.assertEqual(var.mean(), Fraction(n - 1, 2))
+        self.assertEqual(var.cdf(-1), (Fraction(0), Fraction(0)))
+        self.assertEqual(var.cdf(n), (Fraction(1), Fraction(1)))
+        (lower, upper) = var.cdf(n // 2)
+        self.assertLessEqual(lower, Fraction(n // 2 + 1, n))
+        self.assertGreaterEqual(upper, Fraction(n // 2 + 1, n))
+
+    def test_from_arrays_float_buckets(self):
+        # float values and probabilities are represented exactly
+        rng = np.random.default_rng(0)
+        values = rng.uniform(0., 1., 5 * RandomVariable.goalPartCount)
+        probs = rng.uniform(0., 1., len(values))
+        var = RandomVariable.from_arrays(values, probs)
+        total = sum(Fraction(p) for p in probs)
+        self.assertEqual(sum(part._p for part in var._parts), total)
+        self.assertEqual(
+            sum(part._p * part._mean for part in var._parts), sum(Fraction(p) * Fraction(v) for (p, v) in zip(probs, values)))
+        self.assertEqual(var._parts[0]._min, Fraction(values.min()))
+        self.assertEqual(var._parts[-1]._max, Fraction(values.max()))
+
+    def test_outcomes_array(self):
+        var = RandomVariable(outcomes=[
+            {"p": Fraction(1, 4), "value": 3},
+            {"p": Fraction(1, 2), "value": Fraction(1, 2)},
+            {"p": Fraction(1, 4), "value": 1}
+        ])
+        (values, numerators, denominators) = var.outcomes_array()
+        self.assertEqual(values.tolist(), [Fraction(1, 2), 1, 3])
+        self.assertEqual(numerators.tolist(), [1, 1, 1])
+        self.assertEqual(denominators.tolist(), [2, 4, 4])
+        self.assertEqual(list(var.iter_outcomes()), var.outcomes())
+
+    def test_sample(self):
+        var = RandomVariable(outcomes=[
+            {"p": Fraction(1, 4), "value": 1},
+            {"p": Fraction(3, 4), "value": Fraction(5, 2)}]
+        )
+        samples = var.sample(10_000, rng=0)
+        self.assertEqual(set(samples.tolist()), {1, Fraction(5, 2)})
+        self.assertAlmostEqual(sum(samples == 1) / 10_000, 0.25, delta=0.02)
+
+    def test_prob_less(self):
+        var1 = RandomVariable(outcomes=[
+            {"p": Fraction(1, 2), "value": 1},
+            {"p": Fraction(1, 2), "value": 3}]
+        )
+        var2 = RandomVariable(outcomes=[{"p": Fraction(1), "value": 2}])
+        self.assertEqual(var1.prob_less(var2), (Fraction(1, 2), Fraction(1, 2)))
+        self.assertEqual(var1.prob_greater(var2), (Fraction(1, 2), Fraction(1, 2)))
+        self.assertEqual(var2.prob_less(var2), (Fraction(0), Fraction(0)))
+
+    def test_prob_less_lattice(self):
+        # the ties of point parts are resolved exactly
+        self.assertEqual(FairDie(6).prob_less(FairDie(6)), (Fraction(5, 12), Fraction(5, 12)))
+        exact = sum(Fraction(1, 24) for x in range(1, 7) for y in range(1, 5) if x < y)
+        self.assertEqual(FairDie(6).prob_less(FairDie(4)), (exact, exact))
+        self.assertEqual(FairDie(4).prob_greater(FairDie(6)), (exact, exact))
+
+    def test_cdf_sweep(self):
+        var = FairDie(6) + FairDie(4)
+        values = [0, 2, Fraction(7, 2), 5, 10, 11]
+        self.assertEqual(list(var._cdfSweep(values)), [var.cdf(value) for value in values])
+
+    def test_neg(self):
+        var = RandomVariable(outcomes=[
+            {"p": Fraction(1, 4), "value": 1},
+            {"p": Fraction(3, 4), "value": 2}]
+        )
+        expected = [
+            {"p": Fraction(3, 4), "value": -2},
+            {"p": Fraction(1, 4), "value": -1}
+        ]
+        self.assertEqual((-var).outcomes(), expected)
+        self.assertEqual((var * -1).outcomes(), expected)
+
+    def test_sub(self):
+        var1 = RandomVariable(outcomes=[
+            {"p": Fraction(1, 4), "value": 1},
+            {"p": Fraction(3, 4), "value": 2}]
+        )
+        var2 = RandomVariable(outcomes=[{"p": Fraction(1), "value": 5}])
+        expected = [
+            {"p": Fraction(1, 4), "value": -4},
+            {"p": Fraction(3, 4), "value": -3}
+        ]
+        self.assertEqual((var1 - var2).outcomes(), expected)
+
+    def test_sum(self):
+        variables = [FairDie(2), FairDie(3), FairDie(2)]
+        var = RandomVariable.sum(variables)
+        self.assertEqual(var.outcomes(), (variables[0] + variables[1] + variables[2]).outcomes())
+        self.assertIs(RandomVariable.sum([variables[0]]), variables[0])
+        with self.assertRaises(Exception):
+            RandomVariable.sum([])
+
+    def test_compound(self):
+        count = RandomVariable(outcomes=[
+            {"p": Fraction(1, 2), "value": 0},
+            {"p": Fraction(1, 2), "value": 2}]
+        )
+        var = RandomVariable.compound(count, FairDie(2))
+        self.assertEqual(var.cdf(0), (Fraction(1, 2), Fraction(1, 2)))
+        self.assertEqual(var.cdf(2), (Fraction(5, 8), Fraction(5, 8)))
+        self.assertEqual(var.cdf(3), (Fraction(7, 8), Fraction(7, 8)))
+        self.assertEqual(var.mean(), Fraction(3, 2))
+
+    def test_compound_count_pmf(self):
+        previous = RandomVariable.goalPartCount
+        RandomVariable.goalPartCount = 30
+        try:
+            counts = list(range(41))
+            var = RandomVariable.compound((counts, [Fraction(1, 41)] * 41), FairDie(2))
+            self.assertAlmostEqual(float(var.mean()), 20 * 3 / 2)
+            self.assertEqual(var._cdfError, 0)
+        finally:
+            RandomVariable.goalPartCount = previous
+
+    def test_mul_doubling(self):
+        var = FairDie(3)
+        self.assertEqual((var * 5).cdf(8), (var + var + var + var + var).cdf(8))
+
+    def test_from_continuous(self):
+        var = RandomVariable.from_continuous(stats.uniform(0, 4), parts=8)
+        self.assertEqual(len(var._parts), 8)
+        self.assertEqual(var._parts[0]._min, 0)
+        self.assertEqual(var._parts[-1]._max, 4)
+        (lower, upper) = var.cdf(3)
+        self.assertLessEqual(lower, Fraction(3, 4))
+        self.assertGreaterEqual(upper, Fraction(3, 4))
+        self.assertEqual(var.mean(), 2)
+
+    def test_add_scaled(self):
+        var1 = RandomVariable(_parts=[
+            _Part(Fraction(1, 3), Fraction(1, 2), Fraction(5, 12), 0, 1),
+            _Part(Fraction(2, 3), 2, 4, 2, 2)
+        ])
+        var2 = RandomVariable(_parts=[
+            _Part(Fraction(1, 7), Fraction(10, 3), Fraction(100, 9), Fraction(10, 3), Fraction(10, 3)),
+            _Part(Fraction(6, 7), Fraction(2**70, 5), Fraction(2**140, 25), Fraction(2**70, 5), Fraction(2**70, 5))
+        ])
+        for (v1, v2) in [(var1, var1), (var1, var2), (var2, var2)]:
+            pairs = sorted((p1 + p2 for p1 in v1._parts for p2 in v2._parts), key=lambda p: p._min)
+            expected = sorted(str(p) for p in RandomVariable._coalescePoints(pairs))
+            self.assertEqual(sorted(str(p) for p in v1._addScaled(v2)), expected)
+
+    def test_add_scaled_merged(self):
+        # merged parts have unrelated denominators, whose lcm gets too large for the shared integer arithmetic
+        previous = (RandomVariable.goalPartCount, RandomVariable.maxScaledDenominatorBits)
+        (RandomVariable.goalPartCount, RandomVariable.maxScaledDenominatorBits) = (30, 256)
+        try:
+            var = FairDie(50) * 3
+            self.assertIsNone(var._scaledParts())
+            pairs = sorted((p1 + p2 for p1 in var._parts for p2 in var._parts), key=lambda p: p._min)
+            self.assertEqual([str(p) for p in var._addScaled(var)], [str(p) for p in pairs])
+        finally:
+            (RandomVariable.goalPartCount, RandomVariable.maxScaledDenominatorBits) = previous
+
+        # unmerged lattice parts stay on the shared denominators
+        self.assertIsNotNone(FairDie(6)._scaledParts())
+
+    def test_query_parallel(self):
+        var = FairDie(6) + FairDie(6)
+        queries = [("cdf", Fraction(v, 2)) for v in range(30)] + [("quantil_bounds", Fraction(q, 36)) for q in range(37)]
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = var.query_parallel(queries, executor, batch_size=5)
+
+        self.assertEqual(results, [getattr(var, name)(value) for (name, value) in queries])
+        self.assertEqual(var.quantil_bounds(Fraction(1, 2)), (7, 7))
+
+    def test_cdf_table(self):
+        var = FairDie(6) + FairDie(4)
+        points = [Fraction(15, 2), 0, 3, 10, Fraction(5, 2)]
+        (lower, upper) = var.cdf_table(points)
+        self.assertEqual(list(zip(lower, upper)), [var.cdf(value) for value in points])
+
+        (lower, upper) = var.histogram_bounds([0, 5, 10])
+        self.assertEqual(list(lower), [Fraction(10, 24), Fraction(14, 24)])
+        self.assertEqual(list(upper), [Fraction(10, 24), Fraction(14, 24)])
+
+    def test_tail_bounds(self):
+        die = FairDie(6)
+        self.assertEqual(die.tail_expectation_bounds(3), (5, 5))
+        self.assertEqual(die.tail_expectation_bounds(Fraction(7, 2)), (5, 5))
+        self.assertIsNone(die.tail_expectation_bounds(6))
+        self.assertEqual(die.expected_shortfall_bounds(Fraction(1, 3)), (Fraction(9, 2), Fraction(9, 2)))
+        self.assertEqual(die.expected_shortfall_bounds(1), (6, 6))
+
+        # uniform distribution on [0, 1] as a single part
+        uniform = RandomVariable(_parts=[_Part(1, Fraction(1, 2), Fraction(1, 3), 0, 1)])
+        (lower, upper) = uniform.tail_expectation_bounds(Fraction(1, 2))
+        self.assertTrue(lower <= Fraction(3, 4) <= upper)
+        (lower, upper) = uniform.expected_shortfall_bounds(Fraction(1, 2))
+        self.assertTrue(lower <= Fraction(3, 4) <= upper)
+
+    def test_focus(self):
+        previous = RandomVariable.goalPartCount
+        RandomVariable.goalPartCount = 20
+        try:
+            var = RandomVariable.from_arrays(list(range(30)), [Fraction(1, 30)] * 30)
+            for t in [10, 45, 55]:
+                (lower, upper) = (var + var).cdf(t)
+                focused = var.with_focus([(t, 100)]) + var
+                (focused_lower, focused_upper) = focused.cdf(t)
+                self.assertLess(focused_upper - focused_lower, (upper - lower) * Fraction(3, 4))
+                self.assertEqual((-focused)._focus, [(-t, 100)])
+        finally:
+            RandomVariable.goalPartCount = previous
+
+    def test_focus_penalty(self):
+        # the penalty increases the heuristic value of a straddling merge regardless of its sign
+        merged = _Part(Fraction(1, 2), 1, Fraction(3, 2), 0, 2)
+        for value in [-2., -0.5, 0.5, 2.]:
+            penalized = [RandomVariable._focusPenalty(value, [(1, w)], merged) for w in [0, 1, 10]]
+            self.assertEqual(penalized[0], value)
+            self.assertLess(penalized[0], penalized[1])
+            self.assertLess(penalized[1], penalized[2])
+            self.assertEqual(RandomVariable._focusPenalty(value, [(5, 10)], merged), value)
+
+    def test_coalesce_points(self):
+        var = FairDie(6) + FairDie(6)
+        self.assertEqual(len(var._parts), 11)
+        self.assertEqual([p._p for p in var._parts], [Fraction(min(k, 12 - k), 36) for k in range(1, 12)])
+        var = var + FairDie(6)
+        self.assertEqual(len(var._parts), 16)
+        self.assertEqual(var.outcomes()[2], {"p": Fraction(6, 216), "value": 5})
+
+    def test_compound_cdf_error(self):
+        var = RandomVariable.from_continuous(stats.norm(0, 1), parts=20, tail_mass=0.05)
+        count = RandomVariable.from_arrays([1, 2], [Fraction(1, 2), Fraction(1, 2)])
+        compound = RandomVariable.compound(count, var)
+        self.assertEqual(compound._cdfError, Fraction(0.05) * 3 / 2)
+        exact = 0.5 * stats.norm.cdf(-1.9) + 0.5 * stats.norm.cdf(-1.9, scale=2**0.5)
+        (lower, upper) = compound.cdf(Fraction(-19, 10))
+        self.assertLessEqual(lower, exact)
+        self.assertGreaterEqual(upper, exact)
+        positive = RandomVariable.from_continuous(stats.norm(10, 1), parts=4, tail_mass=0.05)
+        self.assertEqual((positive * positive)._cdfError, 2 * Fraction(0.05))
@@ -0,0 +1,27 @@
+import unittest
+from fractions import Fraction
+from probability_calculator.random_variables import RandomVariable, FairDie
+from probability_calculator.running_sum import RunningSum
+
+
+class TestRunningSum(unittest.TestCase):
+    def test_result(self):
+        running_sum = RunningSum()
+        for n in [2, 3, 4, 5, 6]:
+            running_sum.add(FairDie(n))
+        self.assertEqual(len(running_sum), 5)
+        # 5 = 4 + 1 variables
+        self.assertEqual([size for (size, _) in running_sum._stack], [4, 1])
+        expected = FairDie(2) + FairDie(3) + FairDie(4) + FairDie(5) + FairDie(6)
+        self.assertEqual(running_sum.result().outcomes(), expected.outcomes())
+
+    def test_snapshot(self):
+        running_sum = RunningSum([FairDie(2), FairDie(2), FairDie(2)])
+        self.assertEqual(running_sum.result().outcomes(), (FairDie(2) * 3).outcomes())
+        running_sum += FairDie(2)
+        self.assertEqual([size for (size, _) in running_sum._stack], [4])
+        self.assertEqual(running_sum.result().mean(), Fraction(6))
+
+    def test_empty(self):
+        with self.assertRaises(Exception):
+            RunningSum().result()
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import os
+import socket
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
+from probability_calculator.numeric_random_variables import FairDie
+from probability_calculator.server import DistributionServer, Client
+
+
+class TestServer(unittest.TestCase):
+    def test_handle(self):
+        server = DistributionServer(ThreadPoolExecutor(2))
+        expression = {"add": [{"mul": [{"die": 6}, 3]}, {"neg": {"die": 4}}]}
+        response = asyncio.run(server.handle({"expression": expression, "queries": [["cdf", 5], ["mean"]]}))
+        var = FairDie(6) * 3 + -FairDie(4)
+        self.assertEqual(response["results"][0], list(var.cdf(5.)))
+        self.assertAlmostEqual(response["results"][1], var.mean())
+
+        response = asyncio.run(server.handle({
+            "engine": "exact",
+            "expression": {"values": [1, 2], "probs": ["1/3", "2/3"]},
+            "queries": [["cdf", 1], ["mean"]]}))
+        self.assertEqual(response["results"], [["1/3", "1/3"], "5/3"])
+
+        response = asyncio.run(server.handle({"expression": {"die": 6}, "queries": [["plot_outcomes"]]}))
+        self.assertIn("error", response)
+
+    def test_query_methods(self):
+        server = DistributionServer(ThreadPoolExecutor(2))
+        for (engine, method) in [("numeric", "quantil"), ("exact", "residual_mass")]:
+            response = asyncio.run(server.handle({"engine": engine, "expression": {"die": 6}, "queries": [[method]]}))
+            self.assertEqual(response, {"error": "unknown query %s for the %s engine" % (method, engine)})
+        response = asyncio.run(server.handle({"expression": {"die": 6}, "queries": [["residual_mass"]]}))
+        self.assertEqual(response["results"], [0.])
+
+    def test_process_pool(self):
+        # the default executor sends the variables to worker processes and back
+        server = DistributionServer()
+        try:
+            expression = {"add": [{"mul": [{"die": 6}, 3]}, {"die": 4}]}
+            for engine in ["numeric", "exact"]:
+                response = asyncio.run(server.handle({"engine": engine, "expression": expression, "queries": [["mean"]]}))
+                self.assertEqual(float(Fraction(response["results"][0])), 13.)
+        finally:
+            server._executor.shutdown()
+
+    def test_coalescing_and_cache(self):
+        server = DistributionServer(ThreadPoolExecutor(2))
+        expression = {"mul": [{"die": 6}, 20]}
+
+        async def evaluate_twice():
+            return await asyncio.gather(server.evaluate("numeric", expression), server.evaluate("numeric", expression))
+
+        (var1, var2) = asyncio.run(evaluate_twice())
+        self.assertIs(var1, var2)
+        self.assertIs(asyncio.run(server.evaluate("numeric", expression)), var1)
+        self.assertEqual(len(server._cache), 2)
+
+        server.maxCacheSize = 1
+        asyncio.run(server.evaluate("numeric", {"die": 4}))
+        self.assertEqual(len(server._cache), 1)
+
+    def test_client(self):
+        server = DistributionServer(ThreadPoolExecutor(2))
+        loop = asyncio.new_event_loop()
+        # TCP works on all platforms, unlike unix sockets
+        task = loop.create_task(server.serve(port=0))
+
+        def run():
+            try:
+                loop.run_until_complete(task)
+            except asyncio.CancelledError:
+                pass
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        self.assertTrue(server._started.wait(10))
+        port = server._sockets[0].getsockname()[1]
+
+        with Client(port=port) as client:
+            self.assertEqual(client.query({"die": 6}, [["cdf", 3]], engine="exact"), [["1/2", "1/2"]])
+            with self.assertRaises(Exception):
+                client.query({"die": 6}, [["cdf", 3]], engine="unknown")
+            # a malformed line is answered with an error and the connection stays usable
+            client._file.write(b"not json\n")
+            client._file.flush()
+            self.assertIn("error", json.loads(client._file.readline()))
+            self.assertEqual(client.query({"die": 2}, [["mean"]]), [1.5])
+
+        loop.call_soon_threadsafe(task.cancel)
+        thread.join(10)
+
+    @unittest.skipUnless(hasattr(socket, "AF_UNIX"), "unix sockets are not available")
+    def test_client_unix_socket(self):
+        path = os.path.join(tempfile.mkdtemp(), "server.sock")
+        server = DistributionServer(ThreadPoolExecutor(2))
+        loop = asyncio.new_event_loop()
+        task = loop.create_task(server.serve(path))
+
+        def run():
+            try:
+                loop.run_until_complete(task)
+            except asyncio.CancelledError:
+                pass
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        self.assertTrue(server._started.wait(10))
+
+        with Client(path) as client:
+            self.assertEqual(client.query({"die": 6}, [["cdf", 3]], engine="exact"), [["1/2", "1/2"]])
+
+        loop.call_soon_threadsafe(task.cancel)
+        thread.join(10)
+
+    def test_cancelled_evaluation(self):
+        server = DistributionServer(ThreadPoolExecutor(2))
+        expression = {"mul": [{"die": 6}, 3]}
+
+        async def cancel_owner():
+            owner = asyncio.create_task(server.evaluate("numeric", expression))
+            await asyncio.sleep(0)
+            waiter = asyncio.create_task(server.evaluate("numeric", expression))
+            await asyncio.sleep(0)
+            # the owner is cancelled while it waits for the executor
+            owner.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await asyncio.wait_for(waiter, 10)
+            self.assertEqual(server._inFlight, {})
+
+        asyncio.run(cancel_owner())
@@ -0,0 +1,54 @@
+import unittest
+from probability_calculator.random_variables import FairDie
+from probability_calculator.sum_tree import SumTree
+
+
+class Counted:
+    additions = 0
+
+    def __init__(self, value):
+        self.value = value
+
+    def __add__(self, other):
+        Counted.additions += 1
+        return Counted(self.value + other.value)
+
+
+class TestSumTree(unittest.TestCase):
+    def test_result(self):
+        tree = SumTree([FairDie(2), FairDie(3), FairDie(4)])
+        self.assertEqual(tree.result().outcomes(), (FairDie(2) + FairDie(3) + FairDie(4)).outcomes())
+        tree.replace(1, FairDie(6))
+        self.assertEqual(tree.result().outcomes(), (FairDie(2) + FairDie(6) + FairDie(4)).outcomes())
+        tree.remove(0)
+        self.assertEqual(len(tree), 2)
+        self.assertEqual(tree.result().outcomes(), (FairDie(6) + FairDie(4)).outcomes())
+        self.assertEqual(tree.add(FairDie(2)), 0)
+        self.assertEqual(tree.add(FairDie(2)), 3)
+        self.assertEqual(tree.result().mean(), 1.5 + 3.5 + 2.5 + 1.5)
+
+    def test_logarithmic_updates(self):
+        tree = SumTree([Counted(i) for i in range(500)])
+        self.assertEqual(tree.result().value, sum(range(500)))
+        Counted.additions = 0
+        tree.replace(123, Counted(1000))
+        self.assertLessEqual(Counted.additions, 9)
+        self.assertEqual(tree.result().value, sum(range(500)) - 123 + 1000)
+
+        Counted.additions = 0
+        for i in range(20):
+            tree.add(Counted(1))
+        self.assertLessEqual(Counted.additions, 20 * 10)
+        self.assertEqual(tree.result().value, sum(range(500)) - 123 + 1000 + 20)
+
+    def test_empty(self):
+        tree = SumTree()
+        with self.assertRaises(Exception):
+            tree.result()
+        slot = tree.add(FairDie(6))
+        self.assertEqual(tree.result().mean(), 3.5)
+        tree.remove(slot)
+        with self.assertRaises(Exception):
+            tree.result()
+        with self.assertRaises(Exception):
+            tree.remove(slot)